@@ -0,0 +1,44 @@
+cimport cython
+from libc.math cimport sqrt
+
+
+@cython.boundscheck(False)
+@cython.wraparound(False)
+@cython.cdivision(True)
+def compute_forces(
+    const float[:] px,
+    const float[:] py,
+    float[:] fx,
+    float[:] fy,
+    double k,
+    double fmax,
+    double min_dist_sq,
+    double cutoff_sq,
+):
+    cdef Py_ssize_t n = px.shape[0]
+    cdef Py_ssize_t i, j
+    cdef double xi, yi, dx, dy, r2, inv_r, f, ax, ay
+
+    with nogil:
+        for i in range(n):
+            xi = px[i]
+            yi = py[i]
+            ax = 0.0
+            ay = 0.0
+            for j in range(n):
+                if i == j:
+                    continue
+                dx = px[j] - xi
+                dy = py[j] - yi
+                r2 = dx * dx + dy * dy
+                if r2 <= min_dist_sq or r2 > cutoff_sq:
+                    continue
+                inv_r = 1.0 / sqrt(r2)
+                f = k * inv_r * inv_r
+                if f > fmax:
+                    f = fmax
+                f *= inv_r
+                ax += f * dx
+                ay += f * dy
+            fx[i] = ax
+            fy[i] = ay
@@ -0,0 +1,84 @@
+import math
+
+import numpy as np
+from numba import njit, prange
+
+
+@njit(cache=True, parallel=True, fastmath=True)
+def step(
+    px: np.ndarray,
+    py: np.ndarray,
+    vx: np.ndarray,
+    vy: np.ndarray,
+    inv_mass: np.ndarray,
+    dt: float,
+    k: float,
+    fmax: float,
+    min_dist_sq: float,
+    cutoff_sq: float,
+    damping: float,
+    max_velocity: float,
+    x_min: float,
+    y_min: float,
+    x_max: float,
+    y_max: float,
+) -> None:
+    n = px.shape[0]
+    for i in prange(n):
+        xi = px[i]
+        yi = py[i]
+        fx = 0.0
+        fy = 0.0
+        for j in range(n):
+            if i == j:
+                continue
+            dx = px[j] - xi
+            dy = py[j] - yi
+            r2 = dx * dx + dy * dy
+            if r2 <= min_dist_sq or r2 > cutoff_sq:
+                continue
+            inv_r = 1.0 / math.sqrt(r2)
+            f = min(k * inv_r * inv_r, fmax) * inv_r
+            fx += f * dx
+            fy += f * dy
+
+        # ダンピングと速度制限
+        v = (vx[i] + fx * inv_mass[i]) * damping
+        vx[i] = min(max(v, -max_velocity), max_velocity)
+        v = (vy[i] + fy * inv_mass[i]) * damping
+        vy[i] = min(max(v, -max_velocity), max_velocity)
+
+    # 全ノードの力を求めてから位置を更新する
+    for i in prange(n):
+        if px[i] < x_min or px[i] > x_max:
+            px[i] = min(max(px[i], x_min), x_max)
+            vx[i] = -vx[i]
+        if py[i] < y_min or py[i] > y_max:
+            py[i] = min(max(py[i], y_min), y_max)
+            vy[i] = -vy[i]
+        px[i] += vx[i] * dt
+        py[i] += vy[i] * dt
+
+
+# 初回呼び出し時のコンパイルを避けるため、インポート時にウォームアップする
+_warmup_pos = np.zeros((2, 2), dtype=np.float32)
+_warmup_pos[1] = 1.0
+_warmup_vel = np.zeros((2, 2), dtype=np.float32)
+step(
+    _warmup_pos[:, 0],
+    _warmup_pos[:, 1],
+    _warmup_vel[:, 0],
+    _warmup_vel[:, 1],
+    np.ones(2, dtype=np.float32),
+    1.0,
+    1.0,
+    1.0,
+    0.0,
+    4.0,
+    1.0,
+    1.0,
+    0.0,
+    0.0,
+    1.0,
+    1.0,
+)
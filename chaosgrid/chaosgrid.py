@@ -1,48 +1,311 @@
 import pygame
 from pygame import gfxdraw
 import mido
+import numpy as np
 import random
 import math
+import bisect
+import heapq
+import os
+import sys
+import json
+import tempfile
+import functools
 from abc import ABC, abstractmethod
 from uuid import uuid4, UUID
-from typing import List, Dict, Tuple, Callable, Any, Mapping, Optional
+from typing import (
+    List,
+    Dict,
+    Set,
+    Tuple,
+    Callable,
+    Any,
+    Iterable,
+    Mapping,
+    Optional,
+)
 from collections import defaultdict
 
+# スクリプト実行時もカーネルを常に同じモジュール名（chaosgrid._physics_kernel）で
+# importできるよう、リポジトリ直下をパスの先頭に加える（Numbaのキャッシュは
+# モジュール名ごとに作られるので、名前が変わると読み込めない）
+if __name__ == "__main__":
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    from chaosgrid._physics_kernel import step as physics_step
+except ImportError:  # numbaが無い環境ではCython拡張かNumPy実装を使う
+    physics_step = None
+
+try:
+    from chaosgrid._physics import compute_forces
+except ImportError:  # Cython拡張が未ビルドの場合
+    compute_forces = None
+
 
 class PhysicsNode:
     def __init__(
         self, x: int, y: int, radius: int, mass: float, layer_name: str, id: UUID
     ) -> None:
-        self.px = float(x)
-        self.py = float(y)
-        self.vx = 0.0
-        self.vy = 0.0
-        self.mass = mass
+        # フィールドに追加されるまでは自身の配列に状態を保持する
+        self.field: Optional["PhysicsField"] = None
+        self.idx = -1
+        self._pos = np.array([x, y], dtype=np.float32)
+        self._vel = np.zeros(2, dtype=np.float32)
+        self._mass = mass
         self.radius = radius
         self.layer_name = layer_name
         self.id = id
 
-    def apply_force(self, fx: float, fy: float, max_velocity: float = 15) -> None:
-        self.vx += fx / self.mass
-        self.vy += fy / self.mass
-        # ダンピング
-        self.vx *= 0.99
-        self.vy *= 0.99
-        self.vx = min(max(self.vx, -max_velocity), max_velocity)
-        self.vy = min(max(self.vy, -max_velocity), max_velocity)
-
-    def apply_velocity(self, dt: float) -> None:
-        self.px += self.vx * dt
-        self.py += self.vy * dt
+    def _position(self) -> np.ndarray:
+        if self.field is None:
+            return self._pos
+        return self.field.pos[self.idx]
+
+    def _velocity(self) -> np.ndarray:
+        if self.field is None:
+            return self._vel
+        return self.field.vel[self.idx]
+
+    @property
+    def px(self) -> float:
+        return float(self._position()[0])
+
+    @px.setter
+    def px(self, value: float) -> None:
+        self._position()[0] = value
+
+    @property
+    def py(self) -> float:
+        return float(self._position()[1])
+
+    @py.setter
+    def py(self, value: float) -> None:
+        self._position()[1] = value
+
+    @property
+    def vx(self) -> float:
+        return float(self._velocity()[0])
+
+    @vx.setter
+    def vx(self, value: float) -> None:
+        self._velocity()[0] = value
+
+    @property
+    def vy(self) -> float:
+        return float(self._velocity()[1])
+
+    @vy.setter
+    def vy(self, value: float) -> None:
+        self._velocity()[1] = value
+
+    @property
+    def mass(self) -> float:
+        return self._mass
+
+    @mass.setter
+    def mass(self, value: float) -> None:
+        self._mass = value
+        if self.field is not None:
+            self.field.inv_mass[self.idx] = 1.0 / value
+
+    def bind(self, field: "PhysicsField", idx: int) -> None:
+        field.pos[idx] = self._position()
+        field.vel[idx] = self._velocity()
+        field.inv_mass[idx] = 1.0 / self._mass
+        self.field = field
+        self.idx = idx
+
+    def unbind(self) -> None:
+        self._pos = self._position().copy()
+        self._vel = self._velocity().copy()
+        self.field = None
+        self.idx = -1
 
     def get_id(self) -> UUID:
         return self.id
 
 
+class QuadTree:
+    LEAF_CAPACITY = 4
+    MAX_DEPTH = 16
+
+    def __init__(self) -> None:
+        # セルはフレームをまたいで再利用する（子セルは4つ連続で確保）
+        self.used = 0
+        self.x0: List[float] = []
+        self.y0: List[float] = []
+        self.size: List[float] = []
+        self.com_x: List[float] = []
+        self.com_y: List[float] = []
+        self.count: List[int] = []
+        self.child: List[int] = []
+        self.bodies: List[List[int]] = []
+        self.xs: List[float] = []
+        self.ys: List[float] = []
+
+    def _alloc(self, x0: float, y0: float, size: float) -> int:
+        cell = self.used
+        self.used += 1
+        if cell == len(self.x0):
+            self.x0.append(x0)
+            self.y0.append(y0)
+            self.size.append(size)
+            self.com_x.append(0.0)
+            self.com_y.append(0.0)
+            self.count.append(0)
+            self.child.append(-1)
+            self.bodies.append([])
+        else:
+            self.x0[cell] = x0
+            self.y0[cell] = y0
+            self.size[cell] = size
+            self.child[cell] = -1
+            self.bodies[cell].clear()
+        return cell
+
+    def _quadrant(self, cell: int, x: float, y: float) -> int:
+        half = self.size[cell] / 2
+        return int(x >= self.x0[cell] + half) + 2 * int(y >= self.y0[cell] + half)
+
+    def _split(self, cell: int, depth: int) -> None:
+        x0 = self.x0[cell]
+        y0 = self.y0[cell]
+        half = self.size[cell] / 2
+        first = self._alloc(x0, y0, half)
+        self._alloc(x0 + half, y0, half)
+        self._alloc(x0, y0 + half, half)
+        self._alloc(x0 + half, y0 + half, half)
+        self.child[cell] = first
+
+        for b in self.bodies[cell]:
+            q = self._quadrant(cell, self.xs[b], self.ys[b])
+            self.bodies[first + q].append(b)
+        self.bodies[cell].clear()
+
+        for k in range(4):
+            if len(self.bodies[first + k]) > self.LEAF_CAPACITY:
+                if depth + 1 < self.MAX_DEPTH:
+                    self._split(first + k, depth + 1)
+
+    def build(self, pos: np.ndarray) -> None:
+        self.used = 0
+        self.xs = pos[:, 0].tolist()
+        self.ys = pos[:, 1].tolist()
+        if not self.xs:
+            return
+
+        min_x, min_y = pos.min(axis=0).tolist()
+        max_x, max_y = pos.max(axis=0).tolist()
+        size = max(max_x - min_x, max_y - min_y) * (1 + 1e-6) + 1e-6
+        self._alloc(min_x, min_y, size)
+
+        for b in range(len(self.xs)):
+            cell = 0
+            depth = 0
+            while self.child[cell] >= 0:
+                cell = self.child[cell] + self._quadrant(cell, self.xs[b], self.ys[b])
+                depth += 1
+            self.bodies[cell].append(b)
+            if len(self.bodies[cell]) > self.LEAF_CAPACITY and depth < self.MAX_DEPTH:
+                self._split(cell, depth)
+
+        # 子セルは親より後ろに確保されるので、逆順に走査すれば後行順になる
+        for cell in range(self.used - 1, -1, -1):
+            first = self.child[cell]
+            if first < 0:
+                bodies = self.bodies[cell]
+                n = len(bodies)
+                if n > 0:
+                    self.com_x[cell] = sum(self.xs[b] for b in bodies) / n
+                    self.com_y[cell] = sum(self.ys[b] for b in bodies) / n
+            else:
+                n = 0
+                cx = 0.0
+                cy = 0.0
+                for c in range(first, first + 4):
+                    m = self.count[c]
+                    if m > 0:
+                        n += m
+                        cx += self.com_x[c] * m
+                        cy += self.com_y[c] * m
+                if n > 0:
+                    self.com_x[cell] = cx / n
+                    self.com_y[cell] = cy / n
+            self.count[cell] = n
+
+    def compute_forces(
+        self, theta: float, k: float, fmax: float, min_dist_sq: float
+    ) -> np.ndarray:
+        xs = self.xs
+        ys = self.ys
+        forces = np.zeros((len(xs), 2), dtype=np.float32)
+        theta_sq = theta * theta
+        sqrt = math.sqrt
+
+        for i in range(len(xs)):
+            xi = xs[i]
+            yi = ys[i]
+            fx = 0.0
+            fy = 0.0
+            stack = [0]
+            while stack:
+                cell = stack.pop()
+                n = self.count[cell]
+                if n == 0:
+                    continue
+
+                first = self.child[cell]
+                if first < 0:
+                    for j in self.bodies[cell]:
+                        if j == i:
+                            continue
+                        dx = xs[j] - xi
+                        dy = ys[j] - yi
+                        r2 = dx * dx + dy * dy
+                        if r2 <= min_dist_sq:
+                            continue
+                        inv_r = 1.0 / sqrt(r2)
+                        f = k * inv_r * inv_r
+                        if f > fmax:
+                            f = fmax
+                        f *= inv_r
+                        fx += f * dx
+                        fy += f * dy
+                    continue
+
+                dx = self.com_x[cell] - xi
+                dy = self.com_y[cell] - yi
+                r2 = dx * dx + dy * dy
+                size = self.size[cell]
+                # θ < 1/√2 なので自身を含むセルが近似されることはない
+                if size * size < theta_sq * r2:
+                    inv_r = 1.0 / sqrt(r2)
+                    f = k * inv_r * inv_r
+                    if f > fmax:
+                        f = fmax
+                    f *= n * inv_r
+                    fx += f * dx
+                    fy += f * dy
+                else:
+                    stack.extend((first, first + 1, first + 2, first + 3))
+
+            forces[i, 0] = fx
+            forces[i, 1] = fy
+
+        return forces
+
+
 class PhysicsField:
     ATTRACTIVE_FORCE_CONST = 3000
     MAX_ATTRACTIVE_FORCE = 80
     MIN_DIST_SQ = 0
+    DAMPING = 0.99
+    MAX_VELOCITY = 15
+    BARNES_HUT_THETA = 0.7
+    BARNES_HUT_MIN_NODES = 2048
+    # 引力を打ち切る距離（Noneなら全ペアを計算する）
+    CUTOFF_DIST: Optional[float] = None
 
     def __init__(
         self, px: int, py: int, width: int, height: int, nodes: Dict[UUID, PhysicsNode]
@@ -53,62 +316,244 @@ class PhysicsField:
         self.height = height
         self.nodes = nodes
         self.last_time_elapsed: float = 0.0
+        self.quadtree = QuadTree()
+
+        # ノードの状態はSoAで保持する（行番号はindexで管理）
+        self.index: Dict[UUID, int] = {}
+        self.pos = np.zeros((0, 2), dtype=np.float32)
+        self.vel = np.zeros((0, 2), dtype=np.float32)
+        self.inv_mass = np.zeros(0, dtype=np.float32)
+        for node in list(nodes.values()):
+            self.add_node(node)
 
     def add_node(self, node: PhysicsNode) -> None:
-        self.nodes[node.get_id()] = node
+        node_id = node.get_id()
+        idx = self.index.get(node_id)
+        if idx is None:
+            idx = len(self.index)
+            self.index[node_id] = idx
+            self.pos = np.concatenate([self.pos, np.zeros((1, 2), np.float32)])
+            self.vel = np.concatenate([self.vel, np.zeros((1, 2), np.float32)])
+            self.inv_mass = np.concatenate([self.inv_mass, np.zeros(1, np.float32)])
+        else:
+            previous = self.nodes[node_id]
+            if previous is not node:
+                previous.unbind()
+        self.nodes[node_id] = node
+        node.bind(self, idx)
 
     def remove_node(self, node: PhysicsNode) -> None:
         try:
-            self.nodes.pop(node.get_id())
+            removed = self.nodes.pop(node.get_id())
         except KeyError:
             print(f"Node {node} does not exist in the field.")
+            return
 
-    def update(self, dt: float) -> None:
-        for node in self.nodes.values():
-            fx, fy = self.get_force(node)
-            node.apply_force(fx, fy)
-        for node in self.nodes.values():
-            self.check_boundary(node)
-            node.apply_velocity(dt)
-
-    def get_force(self, node: PhysicsNode) -> Tuple[float, float]:
-        fx = 0.0
-        fy = 0.0
-
-        for other_node in self.nodes.values():
-            if node == other_node:
-                continue
-
-            dx = other_node.px - node.px
-            dy = other_node.py - node.py
-            dist_sq = dx**2 + dy**2
-            dist = math.sqrt(dist_sq)
+        idx = self.index.pop(node.get_id())
+        removed.unbind()
+        self.pos = np.delete(self.pos, idx, axis=0)
+        self.vel = np.delete(self.vel, idx, axis=0)
+        self.inv_mass = np.delete(self.inv_mass, idx)
+        for other in self.nodes.values():
+            if other.idx > idx:
+                other.idx -= 1
+                self.index[other.get_id()] = other.idx
 
-            if dist_sq <= self.MIN_DIST_SQ:
-                continue
+    def update(self, dt: float) -> None:
+        if not self.nodes:
+            return
 
-            attractive_force = min(
-                self.ATTRACTIVE_FORCE_CONST / dist_sq, self.MAX_ATTRACTIVE_FORCE
+        pos = self.pos
+        vel = self.vel
+        if physics_step is not None:
+            physics_step(
+                pos[:, 0],
+                pos[:, 1],
+                vel[:, 0],
+                vel[:, 1],
+                self.inv_mass,
+                float(dt),
+                float(self.ATTRACTIVE_FORCE_CONST),
+                float(self.MAX_ATTRACTIVE_FORCE),
+                float(self.MIN_DIST_SQ),
+                self.cutoff_sq(),
+                float(self.DAMPING),
+                float(self.MAX_VELOCITY),
+                float(self.px),
+                float(self.py),
+                float(self.px + self.width),
+                float(self.py + self.height),
             )
+            return
 
-            fx += attractive_force * dx / dist
-            fy += attractive_force * dy / dist
+        acc = self.get_forces()
+        acc *= self.inv_mass[:, None]
+        vel += acc
+        # ダンピング
+        vel *= self.DAMPING
+        np.clip(vel, -self.MAX_VELOCITY, self.MAX_VELOCITY, out=vel)
+
+        # 境界での反射（はみ出した軸の速度を反転）
+        lower = np.array([self.px, self.py], dtype=np.float32)
+        upper = np.array([self.px + self.width, self.py + self.height], np.float32)
+        outside = (pos < lower) | (pos > upper)
+        np.clip(pos, lower, upper, out=pos)
+        np.negative(vel, out=vel, where=outside)
+
+        pos += vel * dt
+
+    def cutoff_sq(self) -> float:
+        if self.CUTOFF_DIST is None:
+            # fastmathのカーネルにinfを渡さないよう有限の最大値を使う
+            return float(np.finfo(np.float64).max)
+        return float(self.CUTOFF_DIST) ** 2
+
+    def get_forces(self) -> np.ndarray:
+        if compute_forces is not None:
+            forces = np.empty_like(self.pos)
+            compute_forces(
+                self.pos[:, 0],
+                self.pos[:, 1],
+                forces[:, 0],
+                forces[:, 1],
+                float(self.ATTRACTIVE_FORCE_CONST),
+                float(self.MAX_ATTRACTIVE_FORCE),
+                float(self.MIN_DIST_SQ),
+                self.cutoff_sq(),
+            )
+            return forces
+
+        # 打ち切り距離がある場合は近傍のバケツだけを調べる
+        if self.CUTOFF_DIST is not None:
+            return self.get_forces_with_cutoff()
+
+        # ノード数が多い場合はBarnes-Hut近似でO(N log N)に抑える
+        if len(self.nodes) >= self.BARNES_HUT_MIN_NODES:
+            self.quadtree.build(self.pos)
+            return self.quadtree.compute_forces(
+                self.BARNES_HUT_THETA,
+                self.ATTRACTIVE_FORCE_CONST,
+                self.MAX_ATTRACTIVE_FORCE,
+                self.MIN_DIST_SQ,
+            )
 
-        return fx, fy
+        # d[i, j] はノードiからノードjへの変位
+        pos = self.pos
+        d = pos[None, :, :] - pos[:, None, :]
+        dist_sq = np.einsum("ijk,ijk->ij", d, d)
+        dist_sq[dist_sq <= self.MIN_DIST_SQ] = np.inf
+        np.fill_diagonal(dist_sq, np.inf)
+
+        return np.einsum("ij,ijk->ik", self.force_scale(dist_sq), d)
+
+    def get_forces_with_cutoff(self) -> np.ndarray:
+        pos = self.pos
+        cutoff = float(self.CUTOFF_DIST)
+        cutoff_sq = cutoff * cutoff
+        forces = np.zeros_like(pos)
+
+        # 打ち切り距離を一辺とするバケツに分ける（バケツ番号順に並べ替え）
+        keys = np.floor(
+            (pos - np.array([self.px, self.py], dtype=np.float32)) / cutoff
+        ).astype(np.int64)
+        cells, inverse = np.unique(keys, axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        order = np.argsort(inverse, kind="stable")
+        splits = np.cumsum(np.bincount(inverse))[:-1]
+        buckets = {
+            (cx, cy): members
+            for (cx, cy), members in zip(cells.tolist(), np.split(order, splits))
+        }
+
+        # 自身のバケツと周囲8バケツのノードだけを相手にする
+        for (cx, cy), members in buckets.items():
+            neighbors = np.concatenate(
+                [
+                    buckets[(cx + ox, cy + oy)]
+                    for ox in (-1, 0, 1)
+                    for oy in (-1, 0, 1)
+                    if (cx + ox, cy + oy) in buckets
+                ]
+            )
+            d = pos[neighbors][None, :, :] - pos[members][:, None, :]
+            dist_sq = np.einsum("ijk,ijk->ij", d, d)
+            dist_sq[
+                (dist_sq <= self.MIN_DIST_SQ)
+                | (dist_sq > cutoff_sq)
+                | (members[:, None] == neighbors[None, :])
+            ] = np.inf
+            forces[members] = np.einsum("ij,ijk->ik", self.force_scale(dist_sq), d)
+
+        return forces
+
+    def force_scale(self, dist_sq: np.ndarray) -> np.ndarray:
+        # 1/r を一度だけ求め、除算を掛け算に置き換える（1/inf = 0）
+        inv_dist = np.sqrt(dist_sq)
+        np.reciprocal(inv_dist, out=inv_dist)
+        scale = inv_dist * inv_dist
+        scale *= self.ATTRACTIVE_FORCE_CONST
+        np.minimum(scale, self.MAX_ATTRACTIVE_FORCE, out=scale)
+        scale *= inv_dist
+        return scale
 
-    def check_boundary(self, node: PhysicsNode) -> None:
-        if node.px < self.px:
-            node.px = self.px
-            node.vx = -node.vx
-        if node.px > self.px + self.width:
-            node.px = self.px + self.width
-            node.vx = -node.vx
-        if node.py < self.py:
-            node.py = self.py
-            node.vy = -node.vy
-        if node.py > self.py + self.height:
-            node.py = self.py + self.height
-            node.vy = -node.vy
+    def get_force(self, node: PhysicsNode) -> Tuple[float, float]:
+        # 1ノード分だけなので、そのノードの行だけをO(N)で求める
+        i = self.index[node.get_id()]
+        d = self.pos - self.pos[i]
+        dist_sq = np.einsum("ij,ij->i", d, d)
+        dist_sq[dist_sq <= self.MIN_DIST_SQ] = np.inf
+        if self.CUTOFF_DIST is not None:
+            dist_sq[dist_sq > float(self.CUTOFF_DIST) ** 2] = np.inf
+        dist_sq[i] = np.inf
+        fx, fy = self.force_scale(dist_sq) @ d
+        return float(fx), float(fy)
+
+
+def _display_format(surface: pygame.Surface) -> pygame.Surface:
+    # 画面と同じピクセル形式にそろえておくとblitのたびの変換が要らない
+    # （画面がまだ無い場合はそのまま返す）
+    if pygame.display.get_surface() is None:
+        return surface
+    if surface.get_flags() & pygame.SRCALPHA:
+        return surface.convert_alpha()
+    return surface.convert()
+
+
+class DirtyRects:
+    MAX_RECTS = 40
+    MAX_AREA_RATIO = 0.4
+
+    def __init__(self, screen_size: Tuple[int, int]) -> None:
+        self.screen_area = screen_size[0] * screen_size[1]
+        self.rects: List[pygame.Rect] = []
+        self.full = True
+        self._states: Dict[Any, Any] = {}
+
+    def add(self, rect: pygame.Rect) -> None:
+        self.rects.append(pygame.Rect(rect))
+
+    def add_if_changed(self, owner: Any, state: Any, rect: pygame.Rect) -> None:
+        # 前回描画したときと見た目が変わった場合だけ更新領域に加える
+        if self._states.get(owner) != state:
+            self._states[owner] = state
+            self.add(rect)
+
+    def invalidate(self) -> None:
+        self.full = True
+
+    def present(self) -> None:
+        # 更新領域が多すぎる・広すぎる場合は画面全体を更新する方が速い
+        area = sum(rect.width * rect.height for rect in self.rects)
+        if (
+            self.full
+            or len(self.rects) > self.MAX_RECTS
+            or area > self.screen_area * self.MAX_AREA_RATIO
+        ):
+            pygame.display.flip()
+        elif self.rects:
+            pygame.display.update(self.rects)
+        self.rects.clear()
+        self.full = False
 
 
 class Cell:
@@ -128,37 +573,55 @@ class CellView:
     def __init__(self, cell: Cell) -> None:
         self.cell = cell
         self.cell_inner_offset = 2
-
-    def draw(self, screen: pygame.Surface, offset_x: int, offset_y: int) -> None:
-        color_intensity = max(0, min(255, self.cell.glow * 2))
-        color = (
-            self.cell.color[0],
-            self.cell.color[1],
-            self.cell.color[2],
-            color_intensity,
-        )
-        gfxdraw.box(
-            screen,
-            pygame.Rect(
-                self.cell.x + offset_x + self.cell_inner_offset,
-                self.cell.y + offset_y + self.cell_inner_offset,
-                self.cell.width - 2 * self.cell_inner_offset,
-                self.cell.height - 2 * self.cell_inner_offset,
-            ),
-            color,
-        )
-        gfxdraw.rectangle(
-            screen,
-            (
-                self.cell.x + offset_x + self.cell_inner_offset,
-                self.cell.y + offset_y + self.cell_inner_offset,
-                self.cell.width - 2 * self.cell_inner_offset,
-                self.cell.height - 2 * self.cell_inner_offset,
-            ),
-            (0, 0, 0),
+        self.rect = pygame.Rect(
+            self.cell.x + self.cell_inner_offset,
+            self.cell.y + self.cell_inner_offset,
+            self.cell.width - 2 * self.cell_inner_offset,
+            self.cell.height - 2 * self.cell_inner_offset,
         )
+        # 発光用の単色Surface（色が変わったときだけ塗り直す）
+        self._glow_surface = _display_format(pygame.Surface(self.rect.size))
+        self._glow_color: Optional[Tuple[int, int, int]] = None
+        self._was_lit = False
 
-        self.cell.glow = max(0, self.cell.glow - 5)
+    def draw_border(self, surface: pygame.Surface) -> None:
+        gfxdraw.rectangle(surface, self.rect, (0, 0, 0))
+
+    def draw(
+        self,
+        screen: pygame.Surface,
+        offset_x: int,
+        offset_y: int,
+        dirty: Optional[DirtyRects] = None,
+    ) -> None:
+        screen.blits(self.get_blits(offset_x, offset_y, dirty), doreturn=False)
+
+    def get_blits(
+        self,
+        offset_x: int,
+        offset_y: int,
+        dirty: Optional[DirtyRects] = None,
+    ) -> List[Tuple[pygame.Surface, pygame.Rect]]:
+        cell = self.cell
+        glow_surface = self._glow_surface
+        color_intensity = max(0, min(255, cell.glow * 2))
+        rect = self.rect.move(offset_x, offset_y)
+        blits = []
+        if color_intensity > 0:
+            if self._glow_color != cell.color:
+                glow_surface.fill(cell.color)
+                self._glow_color = cell.color
+            glow_surface.set_alpha(color_intensity)
+            blits.append((glow_surface, rect))
+
+        # 消灯した直後のフレームも更新して発光を消す
+        if dirty is not None and (color_intensity > 0 or self._was_lit):
+            dirty.add(rect)
+        self._was_lit = color_intensity > 0
+
+        cell.glow = max(0, cell.glow - 5)
+
+        return blits
 
 
 class Grid:
@@ -177,6 +640,8 @@ class Grid:
         self.cell_height = cell_height
         self.rows = rows
         self.cols = cols
+        # 発光中のセル（SoundNode.play_noteで追加される）
+        self.active_cells: Set[Cell] = set()
         self.cells = [
             [
                 Cell(x * cell_width, y * cell_height, cell_width, cell_height, {})
@@ -198,11 +663,48 @@ class GridView:
     def __init__(self, grid: Grid) -> None:
         self.grid = grid
         self.cell_views = [[CellView(cell) for cell in row] for row in self.grid.cells]
+        self._cell_view_map = {
+            cell_view.cell: cell_view for row in self.cell_views for cell_view in row
+        }
 
-    def draw(self, screen: pygame.Surface, offset_x: int, offset_y: int) -> None:
+        # セルの枠は変化しないので一度だけ描画しておく
+        self._background = pygame.Surface(
+            (self.grid.width, self.grid.height), pygame.SRCALPHA
+        )
         for row in self.cell_views:
             for cell_view in row:
-                cell_view.draw(screen, offset_x, offset_y)
+                cell_view.draw_border(self._background)
+        self._background = _display_format(self._background)
+
+    def draw_background(
+        self, surface: pygame.Surface, offset_x: int, offset_y: int
+    ) -> None:
+        # 静的な背景Surfaceに枠を焼き込むときに使う
+        surface.blit(self._background, (offset_x, offset_y))
+
+    def draw(
+        self,
+        screen: pygame.Surface,
+        offset_x: int,
+        offset_y: int,
+        dirty: Optional[DirtyRects] = None,
+    ) -> None:
+        # 枠はdraw_backgroundで背景に描かれている前提で、
+        # 発光中のセルだけを描画し、そのセルの範囲だけ枠を重ね直す
+        # （消灯したセルは消灯後の1フレームを描画してから外す）
+        active_cells = self.grid.active_cells
+        cell_view_map = self._cell_view_map
+        blits: List[Tuple[Any, ...]] = []
+        for cell in list(active_cells):
+            if cell.glow <= 0:
+                active_cells.discard(cell)
+            cell_view = cell_view_map[cell]
+            cell_blits = cell_view.get_blits(offset_x, offset_y, dirty)
+            if cell_blits:
+                blits += cell_blits
+                blits.append((self._background, cell_blits[0][1], cell_view.rect))
+
+        screen.blits(blits, doreturn=False)
 
 
 class NoteInterface(ABC):
@@ -226,21 +728,40 @@ class Sequencer:
         self.notes: List[NoteInterface] = []
         self.last_tick = 0
 
+    @property
+    def notes(self) -> List[NoteInterface]:
+        return self._notes
+
+    @notes.setter
+    def notes(self, notes: List[NoteInterface]) -> None:
+        # 発音判定用にtick順に並べたものを保持する（リストは差し替えて使う）
+        self._notes = notes
+        self._sorted_notes = sorted(notes, key=lambda note: note.get_tick())
+        self._sorted_ticks = [note.get_tick() for note in self._sorted_notes]
+
     def update(self, tick: int) -> None:
         if tick < self.last_tick:
             self.last_tick = tick  # Handle tick overflow if necessary
 
+        sorted_ticks = self._sorted_ticks
+        if not sorted_ticks:
+            self.last_tick = tick
+            return
+
         current_tick = tick % self.length
         last_tick_mod = self.last_tick % self.length
 
-        for note in self.notes:
-            note_tick = note.get_tick()
-            if last_tick_mod <= current_tick:
-                if last_tick_mod < note_tick <= current_tick:
-                    self.callback(note)
-            else:
-                if last_tick_mod < note_tick or note_tick <= current_tick:
-                    self.callback(note)
+        # (last_tick_mod, current_tick] に含まれるノートを二分探索で取り出す
+        sorted_notes = self._sorted_notes
+        start = bisect.bisect_right(sorted_ticks, last_tick_mod)
+        end = bisect.bisect_right(sorted_ticks, current_tick)
+        if last_tick_mod <= current_tick:
+            fired = sorted_notes[start:end]
+        else:
+            fired = sorted_notes[start:] + sorted_notes[:end]
+
+        for note in fired:
+            self.callback(note)
 
         self.last_tick = tick
 
@@ -262,7 +783,14 @@ class SoundNodeInterface(ABC):
 class MidiInstrument:
     def __init__(self, output_port: mido.ports.BaseOutput) -> None:
         self.output_port = output_port
-        self.playing: Dict[Tuple[int, int], Dict[str, Any]] = {}
+        # (channel, note) -> ノートオフする絶対tick
+        self.playing: Dict[Tuple[int, int], int] = {}
+        # (expire_tick, channel, note) のヒープ
+        self._expirations: List[Tuple[int, int, int]] = []
+        # (channel, control, value) -> 送信済みのCCメッセージ（毎フレーム作り直さない）
+        self._cc_messages: Dict[Tuple[int, int, int], mido.Message] = {}
+        # (channel, note) -> ノートオフのメッセージ
+        self._note_off_messages: Dict[Tuple[int, int], mido.Message] = {}
         self.last_tick = 0
 
     def note_on(self, channel: int, note: int, gate_time: int, velocity: float) -> None:
@@ -275,37 +803,56 @@ class MidiInstrument:
             )
         )
         if gate_time > 0:
-            self.playing[(channel, note)] = {"tick_elapsed": 0, "gate_time": gate_time}
+            expire = self.last_tick + gate_time
+            self.playing[(channel, note)] = expire
+            heapq.heappush(self._expirations, (expire, channel, note))
 
     def channel_note_off(self, channel: int) -> None:
-        for (ch, note), info in list(self.playing.items()):
-            if ch == channel:
-                self.output_port.send(
-                    mido.Message("note_off", channel=channel, note=note)
-                )
-                del self.playing[(ch, note)]
+        # 該当チャンネルのキーだけを集めてから削除する
+        to_del = [key for key in self.playing if key[0] == channel]
+        for key in to_del:
+            self._send_note_off(key)
+            del self.playing[key]
 
     def update(self, tick: int) -> None:
-        delta_tick = max(tick - self.last_tick, 0)
         self.last_tick = tick
 
-        for (channel, note), info in list(self.playing.items()):
-            info["tick_elapsed"] += delta_tick
-            if info["tick_elapsed"] >= info["gate_time"]:
-                self.output_port.send(
-                    mido.Message("note_off", channel=channel, note=note)
-                )
-                del self.playing[(channel, note)]
+        # 期限が来たものだけをヒープから取り出す
+        expirations = self._expirations
+        while expirations and expirations[0][0] <= tick:
+            expire, channel, note = heapq.heappop(expirations)
+            # 再発音や手動のノートオフで置き換わった古いエントリは捨てる
+            key = (channel, note)
+            if self.playing.get(key) != expire:
+                continue
+            self._send_note_off(key)
+            del self.playing[key]
+
+    def _send_note_off(self, key: Tuple[int, int]) -> None:
+        message = self._note_off_messages.get(key)
+        if message is None:
+            message = mido.Message("note_off", channel=key[0], note=key[1])
+            self._note_off_messages[key] = message
+        self.output_port.send(message)
 
     def cc(self, channel: int, control: int, value: float) -> None:
-        self.output_port.send(
-            mido.Message(
-                "control_change",
-                channel=channel,
-                control=control,
-                value=int(min(max(value * 127, 0), 127)),
+        # 無限大などでもint変換で落ちないよう、浮動小数のうちに丸める
+        self.cc_int(channel, control, int(min(max(value * 127, 0), 127)))
+
+    def cc_int(self, channel: int, control: int, value: int) -> None:
+        # 0〜127にスケール済みの整数値を送る（範囲外は丸める）
+        if value < 0:
+            value = 0
+        elif value > 127:
+            value = 127
+        key = (channel, control, value)
+        message = self._cc_messages.get(key)
+        if message is None:
+            message = mido.Message(
+                "control_change", channel=channel, control=control, value=value
             )
-        )
+            self._cc_messages[key] = message
+        self.output_port.send(message)
 
 
 class SoundNodeList:
@@ -320,6 +867,10 @@ class SoundNodeList:
             sound_node.update(tick)
 
 
+def _noop_on_play(node: "SoundNode", cell: Cell) -> None:
+    pass
+
+
 class SoundNode(SoundNodeInterface):
     def __init__(
         self,
@@ -329,8 +880,8 @@ class SoundNode(SoundNodeInterface):
         id: UUID,
         layer: str,
         instrument: MidiInstrument,
-        sequence: List[NoteInterface] = [],
-        global_note: Dict[str, Any] = {},
+        sequence: Optional[List[NoteInterface]] = None,
+        global_note: Optional[Dict[str, Any]] = None,
         color: Tuple[int, int, int] = (60, 60, 60),
         enable: bool = True,
     ) -> None:
@@ -343,11 +894,13 @@ class SoundNode(SoundNodeInterface):
         self.instrument = instrument
         self.glow = 0
         self.velocity = 100
-        self.sequence: List[NoteInterface] = sequence
+        self.sequence: List[NoteInterface] = sequence if sequence is not None else []
         self.sequencer = Sequencer(loop_length, self.play_note)
-        self.on_play = lambda node, cell: None
+        self.on_play: Callable[[SoundNode, Cell], None] = _noop_on_play
         self.sequencer.notes = self.sequence
-        self.global_note = global_note
+        self.global_note: Dict[str, Any] = (
+            global_note if global_note is not None else {}
+        )
         self.color = color
         self.enable = enable
 
@@ -379,18 +932,18 @@ class SoundNode(SoundNodeInterface):
 
         cell.glow = 100
         cell.color = self.color
+        self.grid.active_cells.add(cell)
 
         self.instrument.channel_note_off(0)
 
         notes = attributes.get("notes", [])
         if attributes.get("use_global_notes"):
             print(self.global_note.get(self.layer))
+            # セルの属性はノートごとではなく1回だけ読む
+            channel = attributes.get("global_channel", 0)
+            gate_time = attributes.get("global_gate_time", 10)
             notes = [
-                {
-                    "note": n,
-                    "channel": attributes.get("global_channel", 0),
-                    "gate_time": attributes.get("global_gate_time", 10),
-                }
+                {"note": n, "channel": channel, "gate_time": gate_time}
                 for n in self.global_note.get(self.layer, notes)
             ]
             print(notes)
@@ -406,7 +959,10 @@ class SoundNode(SoundNodeInterface):
                 velocity=0.8,
             )
 
-        self.sequencer.notes = attributes.get("sequence", self.sequence)
+        # 同じシーケンスを設定し直す場合は並べ替えを省く
+        sequence = attributes.get("sequence", self.sequence)
+        if sequence is not self.sequencer.notes:
+            self.sequencer.notes = sequence
 
     def update(self, tick: int) -> None:
         self.sequencer.update(tick)
@@ -415,13 +971,39 @@ class SoundNode(SoundNodeInterface):
         return self.id
 
 
+def _render_sprite(
+    size: Tuple[int, int],
+    color: Tuple[int, int, int],
+    draw: Callable[[pygame.Surface, Tuple[int, int, int]], None],
+) -> pygame.Surface:
+    # 透明なSurfaceに直接描くとアンチエイリアスが薄くなるので、
+    # 黒地に白で描いた濃淡をそのままアルファ値として使う
+    coverage = pygame.Surface(size)
+    draw(coverage, (255, 255, 255))
+    sprite = pygame.Surface(size, pygame.SRCALPHA)
+    sprite.fill(color)
+    pygame.surfarray.pixels_alpha(sprite)[:] = pygame.surfarray.array_red(coverage)
+    return _display_format(sprite)
+
+
 class NodeViewInterface(ABC):
     @abstractmethod
-    def draw(self, screen: pygame.Surface, offset_x: int, offset_y: int) -> None:
+    def draw(
+        self,
+        screen: pygame.Surface,
+        offset_x: int,
+        offset_y: int,
+        dirty: Optional[DirtyRects] = None,
+    ) -> None:
         pass
 
 
 class NodeView(NodeViewInterface):
+    # 半径と色ごとに描画済みのリング（全NodeViewで共有）
+    _ring_cache: Dict[Tuple[int, Tuple[int, int, int]], pygame.Surface] = {}
+    # 半径と発光の強さごとの半透明の白い円
+    _glow_cache: Dict[Tuple[int, int], pygame.Surface] = {}
+
     def __init__(
         self,
         physics_node: PhysicsNode,
@@ -429,38 +1011,101 @@ class NodeView(NodeViewInterface):
     ) -> None:
         self.sound_node = sound_node
         self.physics_node = physics_node
+        self._last_rect: Optional[pygame.Rect] = None
+
+        # 有効・無効どちらのリングも描画ループに入る前に用意しておく
+        ring_colors = [(0, 0, 0)]
+        if sound_node is not None:
+            ring_colors = [sound_node.color, (240, 240, 240)]
+        for ring_color in ring_colors:
+            self._get_ring_surface(physics_node.radius, ring_color)
 
-    def draw(self, screen: pygame.Surface, offset_x: int, offset_y: int) -> None:
+    def draw(
+        self,
+        screen: pygame.Surface,
+        offset_x: int,
+        offset_y: int,
+        dirty: Optional[DirtyRects] = None,
+    ) -> None:
+        screen.blits(self.get_blits(offset_x, offset_y, dirty), doreturn=False)
+
+    def get_blits(
+        self,
+        offset_x: int,
+        offset_y: int,
+        dirty: Optional[DirtyRects] = None,
+    ) -> List[Tuple[pygame.Surface, Tuple[int, int]]]:
+        """1フレーム分の (Surface, 位置) を返す（Surface.blitsでまとめて描画する用）"""
+        sound_node = self.sound_node
+        physics_node = self.physics_node
         color_intensity = 0
         ring_color = (0, 0, 0)
-        if self.sound_node is not None:
-            color_intensity = max(0, min(255, self.sound_node.glow * 2))
-            self.sound_node.glow = max(0, self.sound_node.glow - 8)
-            ring_color = self.sound_node.color
-            if not self.sound_node.enable:
+        if sound_node is not None:
+            color_intensity = max(0, min(255, sound_node.glow * 2))
+            sound_node.glow = max(0, sound_node.glow - 8)
+            ring_color = sound_node.color
+            if not sound_node.enable:
                 ring_color = (240, 240, 240)
-        color = (255, 255, 255, color_intensity)
-        gfxdraw.filled_circle(
-            screen,
-            int(self.physics_node.px) + offset_x,
-            int(self.physics_node.py) + offset_y,
-            self.physics_node.radius,
-            color,
-        )
-        gfxdraw.aacircle(
-            screen,
-            int(self.physics_node.px) + offset_x,
-            int(self.physics_node.py) + offset_y,
-            self.physics_node.radius,
-            ring_color,
-        )
-        gfxdraw.aacircle(
-            screen,
-            int(self.physics_node.px) + offset_x,
-            int(self.physics_node.py) + offset_y,
-            self.physics_node.radius - 2,
-            ring_color,
-        )
+        x = int(physics_node.px) + offset_x
+        y = int(physics_node.py) + offset_y
+        radius = physics_node.radius
+        topleft = (x - radius - 1, y - radius - 1)
+        blits = []
+        if color_intensity > 0:
+            blits.append((self._get_glow_surface(radius, color_intensity), topleft))
+        blits.append((self._get_ring_surface(radius, ring_color), topleft))
+
+        if dirty is not None:
+            # 移動前と移動後の両方の領域を更新する
+            rect = pygame.Rect(
+                x - radius - 1,
+                y - radius - 1,
+                2 * radius + 3,
+                2 * radius + 3,
+            )
+            state = (rect.topleft, color_intensity, ring_color)
+            if self._last_rect is not None:
+                dirty.add_if_changed(self, state, rect.union(self._last_rect))
+            else:
+                dirty.add_if_changed(self, state, rect)
+            self._last_rect = rect
+
+        return blits
+
+    @classmethod
+    def _get_ring_surface(
+        cls, radius: int, ring_color: Tuple[int, int, int]
+    ) -> pygame.Surface:
+        key = (radius, ring_color)
+        surface = cls._ring_cache.get(key)
+        if surface is None:
+            size = 2 * radius + 3
+
+            def draw_rings(target: pygame.Surface, color: Tuple[int, int, int]) -> None:
+                gfxdraw.aacircle(target, radius + 1, radius + 1, radius, color)
+                gfxdraw.aacircle(target, radius + 1, radius + 1, radius - 2, color)
+
+            surface = _render_sprite((size, size), ring_color, draw_rings)
+            cls._ring_cache[key] = surface
+        return surface
+
+    @classmethod
+    def _get_glow_surface(cls, radius: int, intensity: int) -> pygame.Surface:
+        # colorkeyとset_alphaの組み合わせは遅いので、強さごとにアルファを焼き込む
+        key = (radius, intensity)
+        surface = cls._glow_cache.get(key)
+        if surface is None:
+            size = 2 * radius + 3
+            surface = pygame.Surface((size, size), pygame.SRCALPHA)
+            gfxdraw.filled_circle(
+                surface, radius + 1, radius + 1, radius, (255, 255, 255, 255)
+            )
+            alpha = pygame.surfarray.pixels_alpha(surface)
+            alpha[alpha > 0] = intensity
+            del alpha
+            surface = _display_format(surface)
+            cls._glow_cache[key] = surface
+        return surface
 
 
 class UIElement(ABC):
@@ -469,7 +1114,7 @@ class UIElement(ABC):
         pass
 
     @abstractmethod
-    def draw(self, screen: pygame.Surface) -> None:
+    def draw(self, screen: pygame.Surface, dirty: Optional[DirtyRects] = None) -> None:
         pass
 
 
@@ -497,48 +1142,58 @@ class ButtonWidget(UIElement):
         self.alpha_increment = 20
         self.is_clicked = False
 
-    def draw(self, screen: pygame.Surface) -> None:
-        rect = pygame.Rect(
+        # マウス判定用（右端・下端も含める）
+        self._hit_rect = pygame.Rect(self.x, self.y, self.width + 1, self.height + 1)
+
+        # 描画に使うRectとSurfaceはキャッシュしておく
+        self._rect = pygame.Rect(
             self.x + self.margin,
             self.y + self.margin,
             self.width - 2 * self.margin,
             self.height - 2 * self.margin,
         )
+        # 単色で塗っておき、透明度はset_alphaで反映する
+        self._hover_surface = _display_format(pygame.Surface(self._rect.size))
+        # マウスオーバー時の色
+        self._hover_surface.fill((255, 255, 255))
+        self._click_surface = _display_format(pygame.Surface(self._rect.size))
+        # クリック時の色
+        self._click_surface.fill((60, 60, 60))
+        self._render_text()
 
-        # 透明度の反映
-        hover_surface = pygame.Surface(
-            (self.width - 2 * self.margin, self.height - 2 * self.margin),
-            pygame.SRCALPHA,
+    def _render_text(self) -> None:
+        self._text_surface = _display_format(
+            self.font.render(self.text, True, (0, 0, 0))
         )
-        click_surface = pygame.Surface(
-            (self.width - 2 * self.margin, self.height - 2 * self.margin),
-            pygame.SRCALPHA,
+        self._text_rect = self._text_surface.get_rect(
+            center=(self.x + self.width / 2, self.y + self.height / 2)
         )
 
-        # マウスオーバー時の色
-        hover_surface.fill((255, 255, 255, self.hover_alpha))
-        # クリック時の色
-        click_surface.fill((60, 60, 60, self.click_alpha))
+    def set_text(self, new_text: str) -> None:
+        if new_text != self.text:
+            self.text = new_text
+            self._render_text()
+
+    def draw(self, screen: pygame.Surface, dirty: Optional[DirtyRects] = None) -> None:
+        if dirty is not None:
+            dirty.add_if_changed(
+                self, (self.hover_alpha, self.click_alpha, self.text), self._rect
+            )
 
-        screen.blit(hover_surface, (self.x + self.margin, self.y + self.margin))
-        screen.blit(click_surface, (self.x + self.margin, self.y + self.margin))
+        # 透明度の反映
+        if self.hover_alpha > 0:
+            self._hover_surface.set_alpha(self.hover_alpha)
+            screen.blit(self._hover_surface, self._rect)
+        if self.click_alpha > 0:
+            self._click_surface.set_alpha(self.click_alpha)
+            screen.blit(self._click_surface, self._rect)
 
         # 通常時のボタンの枠
-        gfxdraw.rectangle(screen, rect, (30, 30, 30))
-
-        text = self.font.render(self.text, True, (0, 0, 0))
-        text_rect = text.get_rect(
-            center=(self.x + self.width / 2, self.y + self.height / 2)
-        )
-        screen.blit(text, text_rect)
+        gfxdraw.rectangle(screen, self._rect, (30, 30, 30))
 
-        mouse_pos = pygame.mouse.get_pos()
-        mouse_over = (
-            self.x <= mouse_pos[0] <= self.x + self.width
-            and self.y <= mouse_pos[1] <= self.y + self.height
-        )
+        screen.blit(self._text_surface, self._text_rect)
 
-        if mouse_over:
+        if self._hit_rect.collidepoint(pygame.mouse.get_pos()):
             if self.hover_alpha < 250:
                 self.hover_alpha = min(250, self.hover_alpha + self.alpha_increment)
         else:
@@ -553,13 +1208,11 @@ class ButtonWidget(UIElement):
                 self.click_alpha = max(0, self.click_alpha - self.alpha_increment)
 
     def update(self, event: pygame.event.Event) -> None:
-        mouse_pos = pygame.mouse.get_pos()
-        mouse_over = (
-            self.x <= mouse_pos[0] <= self.x + self.width
-            and self.y <= mouse_pos[1] <= self.y + self.height
-        )
-
-        if mouse_over and event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+        if (
+            event.type == pygame.MOUSEBUTTONDOWN
+            and event.button == 1
+            and self._hit_rect.collidepoint(event.pos)
+        ):
             self.is_clicked = True
             self.on_click()
 
@@ -585,18 +1238,25 @@ class KnobWidget(UIElement):
         self.min_angle = -math.pi * 5 / 6  # -150 degrees
         self.max_angle = math.pi * 5 / 6  # 150 degrees
 
-    def draw(self, screen: pygame.Surface) -> None:
+    def draw(self, screen: pygame.Surface, dirty: Optional[DirtyRects] = None) -> None:
         center_x = self.x + self.width // 2
         center_y = self.y + self.height // 2
 
+        if dirty is not None:
+            dirty.add_if_changed(
+                self, self.angle, pygame.Rect(self.x, self.y, self.width, self.height)
+            )
+
         # ノブの背景（円の縁）
         gfxdraw.aacircle(screen, center_x, center_y, self.radius, (30, 30, 30))
 
         # ノブのハンドル
-        handle_x = center_x + self.radius * math.cos(self.angle)
-        handle_y = center_y + self.radius * math.sin(self.angle)
-        handle_inner_x = center_x + (self.radius // 2) * math.cos(self.angle)
-        handle_inner_y = center_y + (self.radius // 2) * math.sin(self.angle)
+        cos_a = math.cos(self.angle)
+        sin_a = math.sin(self.angle)
+        handle_x = center_x + self.radius * cos_a
+        handle_y = center_y + self.radius * sin_a
+        handle_inner_x = center_x + (self.radius // 2) * cos_a
+        handle_inner_y = center_y + (self.radius // 2) * sin_a
         pygame.draw.aaline(
             screen,
             (0, 0, 0),
@@ -612,7 +1272,7 @@ class KnobWidget(UIElement):
         center_y = self.y + self.height // 2
         dx = mouse_pos[0] - center_x
         dy = mouse_pos[1] - center_y
-        distance = math.sqrt(dx**2 + dy**2)
+        distance = math.hypot(dx, dy)
 
         if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
             if distance <= self.radius:
@@ -655,12 +1315,37 @@ class RotateListWidget(UIElement):
         self.alpha_increment = 20
         self.is_hovered = False
 
-    def draw(self, screen: pygame.Surface) -> None:
-        mouse_pos = pygame.mouse.get_pos()
-        self.is_hovered = (
-            self.x <= mouse_pos[0] <= self.x + self.width
-            and self.y <= mouse_pos[1] <= self.y + self.height
+        # マウス判定用（右端・下端も含める）
+        self._hit_rect = pygame.Rect(self.x, self.y, self.width + 1, self.height + 1)
+
+        # 描画に使うRectとSurfaceはキャッシュしておく
+        self._rect = pygame.Rect(
+            self.x + self.margin,
+            self.y + self.margin,
+            self.width - 2 * self.margin,
+            self.height - 2 * self.margin,
         )
+        self._hover_surface = _display_format(pygame.Surface(self._rect.size))
+        self._hover_surface.fill((255, 255, 255))
+        self._center = (self.x + self.width / 2, self.y + self.height / 2)
+        self._option_surfaces = [
+            _display_format(self.font.render(option, True, (30, 30, 30)))
+            for option in self.options
+        ]
+        self._faded_option_surfaces: Dict[Tuple[int, int], pygame.Surface] = {}
+
+    def _faded_option_surface(self, index: int) -> pygame.Surface:
+        shade = 200 - self.hover_alpha // 5
+        surface = self._faded_option_surfaces.get((index, shade))
+        if surface is None:
+            surface = _display_format(
+                self.font.render(self.options[index], True, (shade, shade, shade))
+            )
+            self._faded_option_surfaces[(index, shade)] = surface
+        return surface
+
+    def draw(self, screen: pygame.Surface, dirty: Optional[DirtyRects] = None) -> None:
+        self.is_hovered = self._hit_rect.collidepoint(pygame.mouse.get_pos())
 
         if self.is_hovered:
             if self.hover_alpha < 250:
@@ -669,74 +1354,45 @@ class RotateListWidget(UIElement):
             if self.hover_alpha > 0:
                 self.hover_alpha = max(0, self.hover_alpha - self.alpha_increment)
 
-        rect = pygame.Rect(
-            self.x + self.margin,
-            self.y + self.margin,
-            self.width - 2 * self.margin,
-            self.height - 2 * self.margin,
-        )
+        if dirty is not None:
+            # 前後の選択肢は枠の外にはみ出して描画される
+            dirty.add_if_changed(
+                self,
+                (self.hover_alpha, self.current_index, self.is_hovered),
+                self._rect.inflate(0, 60),
+            )
 
         # 背景の塗りつぶし
-        hover_surface = pygame.Surface(
-            (self.width - 2 * self.margin, self.height - 2 * self.margin),
-            pygame.SRCALPHA,
-        )
-        hover_surface.fill((255, 255, 255, self.hover_alpha))
-        screen.blit(hover_surface, (self.x + self.margin, self.y + self.margin))
+        if self.hover_alpha > 0:
+            self._hover_surface.set_alpha(self.hover_alpha)
+            screen.blit(self._hover_surface, self._rect)
 
         # 現在の選択肢を表示
-        current_text = self.font.render(
-            self.options[self.current_index], True, (30, 30, 30)
-        )
-        current_text_rect = current_text.get_rect(
-            center=(self.x + self.width / 2, self.y + self.height / 2)
-        )
-        screen.blit(current_text, current_text_rect)
+        center_x, center_y = self._center
+        current_text = self._option_surfaces[self.current_index]
+        screen.blit(current_text, current_text.get_rect(center=self._center))
 
         if self.is_hovered:
             # 前後の選択肢を表示
             prev_index = (self.current_index - 1) % len(self.options)
             next_index = (self.current_index + 1) % len(self.options)
 
-            prev_text = self.font.render(
-                self.options[prev_index],
-                True,
-                (
-                    200 - self.hover_alpha // 5,
-                    200 - self.hover_alpha // 5,
-                    200 - self.hover_alpha // 5,
-                ),
-            )
-            prev_text_rect = prev_text.get_rect(
-                center=(self.x + self.width / 2, self.y + self.height / 2 - 30)
-            )
-            screen.blit(prev_text, prev_text_rect)
+            prev_text = self._faded_option_surface(prev_index)
+            screen.blit(prev_text, prev_text.get_rect(center=(center_x, center_y - 30)))
 
-            next_text = self.font.render(
-                self.options[next_index],
-                True,
-                (
-                    200 - self.hover_alpha // 5,
-                    200 - self.hover_alpha // 5,
-                    200 - self.hover_alpha // 5,
-                ),
-            )
-            next_text_rect = next_text.get_rect(
-                center=(self.x + self.width / 2, self.y + self.height / 2 + 30)
-            )
-            screen.blit(next_text, next_text_rect)
+            next_text = self._faded_option_surface(next_index)
+            screen.blit(next_text, next_text.get_rect(center=(center_x, center_y + 30)))
 
         # 枠を描画
-        gfxdraw.rectangle(screen, rect, (60, 60, 60))
+        gfxdraw.rectangle(screen, self._rect, (60, 60, 60))
 
     def update(self, event: pygame.event.Event) -> None:
-        mouse_pos = pygame.mouse.get_pos()
-        self.is_hovered = (
-            self.x <= mouse_pos[0] <= self.x + self.width
-            and self.y <= mouse_pos[1] <= self.y + self.height
-        )
+        if event.type != pygame.MOUSEWHEEL:
+            return
 
-        if self.is_hovered and event.type == pygame.MOUSEWHEEL:
+        # ホイール操作のときだけマウス位置を判定する
+        self.is_hovered = self._hit_rect.collidepoint(pygame.mouse.get_pos())
+        if self.is_hovered:
             if event.y > 0:  # マウスホイールアップ
                 self.current_index = (self.current_index - 1) % len(self.options)
             elif event.y < 0:  # マウスホイールダウン
@@ -764,22 +1420,34 @@ class TextWidget(UIElement):
         self.color = color
         self.margin = 2
 
-    def draw(self, screen: pygame.Surface) -> None:
-        rect = pygame.Rect(
+        # 描画に使うRectとSurfaceはキャッシュしておく
+        self._rect = pygame.Rect(
             self.x + self.margin,
             self.y + self.margin,
             self.width - 2 * self.margin,
             self.height - 2 * self.margin,
         )
-        gfxdraw.rectangle(screen, rect, (30, 30, 30))
-        text_surface = self.font.render(self.text, True, self.color)
-        text_rect = text_surface.get_rect(
+        self._render_text()
+
+    def _render_text(self) -> None:
+        self._text_surface = _display_format(
+            self.font.render(self.text, True, self.color)
+        )
+        self._text_rect = self._text_surface.get_rect(
             center=(self.x + self.width / 2, self.y + self.height / 2)
         )
-        screen.blit(text_surface, text_rect)
+
+    def draw(self, screen: pygame.Surface, dirty: Optional[DirtyRects] = None) -> None:
+        if dirty is not None:
+            dirty.add_if_changed(self, self.text, self._rect)
+
+        gfxdraw.rectangle(screen, self._rect, (30, 30, 30))
+        screen.blit(self._text_surface, self._text_rect)
 
     def set_text(self, new_text: str) -> None:
-        self.text = new_text
+        if new_text != self.text:
+            self.text = new_text
+            self._render_text()
 
     def update(self, event: pygame.event.Event) -> None:
         pass
@@ -792,37 +1460,41 @@ class ContainerWidget(UIElement):
         y: int,
         width: int,
         height: int,
-        widgets: List[UIElement] = [],
+        widgets: Optional[List[UIElement]] = None,
     ) -> None:
         self.x = x
         self.y = y
         self.width = width
         self.height = height
-        self.widgets = widgets
+        self.widgets = widgets if widgets is not None else []
         self.hover_alpha = 0
         self.alpha_increment = 20
         self.is_hovered = False
 
-    def draw(self, screen: pygame.Surface) -> None:
+        # マウス判定用（右端・下端も含める）
+        self._hit_rect = pygame.Rect(self.x, self.y, self.width + 1, self.height + 1)
+
+        self._hover_surface = _display_format(pygame.Surface((self.width, self.height)))
+        self._hover_surface.fill((255, 255, 255))
+
+    def draw(self, screen: pygame.Surface, dirty: Optional[DirtyRects] = None) -> None:
         rect = pygame.Rect(self.x, self.y, self.width, self.height)
+        if dirty is not None:
+            dirty.add_if_changed(self, self.hover_alpha, rect)
 
         # 背景の塗りつぶし
-        hover_surface = pygame.Surface((self.width, self.height), pygame.SRCALPHA)
-        hover_surface.fill((255, 255, 255, self.hover_alpha))
-        screen.blit(hover_surface, (self.x, self.y))
+        if self.hover_alpha > 0:
+            self._hover_surface.set_alpha(self.hover_alpha)
+            screen.blit(self._hover_surface, rect)
 
         # 枠の描画
         gfxdraw.rectangle(screen, rect, (30, 30, 30))
 
         # 各ウィジェットの描画
         for widget in self.widgets:
-            widget.draw(screen)
+            widget.draw(screen, dirty)
 
-        mouse_pos = pygame.mouse.get_pos()
-        self.is_hovered = (
-            self.x <= mouse_pos[0] <= self.x + self.width
-            and self.y <= mouse_pos[1] <= self.y + self.height
-        )
+        self.is_hovered = self._hit_rect.collidepoint(pygame.mouse.get_pos())
 
         if self.is_hovered:
             if self.hover_alpha < 250:
@@ -861,88 +1533,131 @@ class SequencerWidget:
         self.alpha_increment = 5
         self.margin = 2
 
-    def draw(self, screen: pygame.Surface) -> None:
+        # 枠とホバー用のSurfaceは一度だけ作る（単色なのでサーフェスアルファで重ねる）
+        self._border_rect = pygame.Rect(
+            self.x + self.margin,
+            self.y + self.margin,
+            self.width - 2 * self.margin,
+            self.height - 2 * self.margin,
+        )
+        self._hover_surface = _display_format(pygame.Surface(self._border_rect.size))
+        self._hover_surface.fill((220, 220, 220))
+
+        # ノートの並びと座標はノートが差し替わったときだけ作り直す
+        self._cached_notes: Optional[List[NoteInterface]] = None
+        self._cache_key: Optional[Tuple[int, int, int, int, int]] = None
+        self._sorted_ticks: List[int] = []
+        self._points: List[Tuple[float, float]] = []
+        self._int_points: List[Tuple[int, int]] = []
+        # 再生位置以外の図形（ノートを結ぶ線など）を描画したSurfaceとその位置
+        self._shape_surface: Optional[pygame.Surface] = None
+        self._shape_pos = (self.x, self.y)
+
+    def _update_cache(self) -> None:
+        notes = self.sequencer.notes
+        key = (
+            len(notes),
+            self.sequencer.length,
+            self.radius,
+            self.center_x,
+            self.center_y,
+        )
+        if notes is self._cached_notes and key == self._cache_key:
+            return
+
+        self._cached_notes = notes
+        self._cache_key = key
+        self._sorted_ticks = sorted(note.get_tick() for note in notes)
+        angles = (
+            2 * np.pi * np.asarray(self._sorted_ticks, dtype=np.float64)
+        ) / self.sequencer.length - np.pi / 2
+        xs = self.center_x + self.radius * np.cos(angles)
+        ys = self.center_y + self.radius * np.sin(angles)
+        self._points = list(zip(xs.tolist(), ys.tolist()))
+        self._int_points = [(int(x), int(y)) for x, y in self._points]
+        self._render_shape()
+
+    def _render_shape(self) -> None:
+        # ノートが変わるまで形は変わらないので、図形を囲む範囲だけ1枚に描いておく
+        if len(self._int_points) < 1:
+            radius = 5
+            color = self.color
+        else:
+            radius = self.radius
+            color = (60, 60, 60)
+        if len(self._int_points) < 2:
+            bounds = pygame.Rect(0, 0, 2 * radius + 1, 2 * radius + 1)
+            bounds.center = (self.center_x, self.center_y)
+        else:
+            xs = [x for x, _ in self._int_points]
+            ys = [y for _, y in self._int_points]
+            bounds = pygame.Rect(
+                min(xs), min(ys), max(xs) - min(xs) + 1, max(ys) - min(ys) + 1
+            )
+        # アンチエイリアスのはみ出し分の余白
+        bounds.inflate_ip(4, 4)
+
+        cx = self.center_x - bounds.x
+        cy = self.center_y - bounds.y
+        points = [(x - bounds.x, y - bounds.y) for x, y in self._int_points]
+
+        def draw_shape(target: pygame.Surface, color: Tuple[int, int, int]) -> None:
+            if len(points) < 1:
+                pygame.draw.circle(target, color, (cx, cy), 5)
+            elif len(points) == 1:
+                gfxdraw.aacircle(target, cx, cy, self.radius, color)
+            else:
+                pygame.draw.aalines(target, color, True, points)
+
+        self._shape_surface = _render_sprite(bounds.size, color, draw_shape)
+        self._shape_pos = bounds.topleft
+
+    def draw(self, screen: pygame.Surface, dirty: Optional[DirtyRects] = None) -> None:
+        if dirty is not None:
+            dirty.add_if_changed(
+                self,
+                (
+                    self.sequencer.last_tick,
+                    len(self.sequencer.notes),
+                    self.background_alpha,
+                ),
+                pygame.Rect(self.x, self.y, self.width, self.height),
+            )
+
         self.draw_sequence(screen)
         self.draw_border(screen)
 
     def draw_sequence(self, screen: pygame.Surface) -> None:
         sequencer = self.sequencer
-        notes = sorted(sequencer.notes, key=lambda note: note.get_tick())
-        if len(notes) < 1:
-            pygame.draw.circle(
-                screen,
-                self.color,
-                (self.center_x, self.center_y),
-                5,
-            )
+        self._update_cache()
+        ticks = self._sorted_ticks
+        points = self._points
+        screen.blit(self._shape_surface, self._shape_pos)
+        if len(ticks) < 1:
             return
 
-        angles = [2 * math.pi * note.get_tick() / sequencer.length for note in notes]
-        points = [
-            (
-                self.center_x + self.radius * math.cos(angle - math.pi / 2),
-                self.center_y + self.radius * math.sin(angle - math.pi / 2),
-            )
-            for angle in angles
-        ]
-
-        if len(notes) == 1:
-            gfxdraw.aacircle(
-                screen, self.center_x, self.center_y, self.radius, (60, 60, 60)
-            )
+        if len(ticks) == 1:
             angle = 2 * math.pi * sequencer.last_tick / sequencer.length - math.pi / 2
-            gfxdraw.filled_circle(
-                screen,
-                int(self.center_x + math.cos(angle) * self.radius),
-                int(self.center_y + math.sin(angle) * self.radius),
-                5,
-                self.color,
-            )
-            gfxdraw.aacircle(
-                screen,
-                int(self.center_x + math.cos(angle) * self.radius),
-                int(self.center_y + math.sin(angle) * self.radius),
-                5,
-                self.color,
-            )
+            handle_x = int(self.center_x + math.cos(angle) * self.radius)
+            handle_y = int(self.center_y + math.sin(angle) * self.radius)
+            gfxdraw.filled_circle(screen, handle_x, handle_y, 5, self.color)
+            gfxdraw.aacircle(screen, handle_x, handle_y, 5, self.color)
             return
 
-        for i in range(len(points) - 1):
-            pygame.draw.aaline(
-                screen,
-                (60, 60, 60),
-                (int(points[i][0]), int(points[i][1])),
-                (int(points[i + 1][0]), int(points[i + 1][1])),
-            )
-
-        pygame.draw.aaline(
-            screen,
-            (60, 60, 60),
-            (int(points[-1][0]), int(points[-1][1])),
-            (int(points[0][0]), int(points[0][1])),
-        )
-
         # 現在の位置を計算して線の上に小さな円を描画
-        current_tick = sequencer.last_tick % sequencer.length
-        current_index = 0
-        for i, note in enumerate(notes):
-            if note.get_tick() >= current_tick:
-                current_index = i
-                break
+        length = sequencer.length
+        current_tick = sequencer.last_tick % length
+        current_index = bisect.bisect_left(ticks, current_tick)
+        if current_index == len(ticks):
+            current_index = 0
 
         next_point = points[current_index]
         prev_point = points[current_index - 1]
+        prev_tick = ticks[current_index - 1]
         lerp_ratio = (
-            (current_tick - notes[current_index - 1].get_tick() + sequencer.length)
-            % sequencer.length
-            / (
-                (
-                    notes[current_index].get_tick()
-                    - notes[current_index - 1].get_tick()
-                    + sequencer.length
-                )
-                % sequencer.length
-            )
+            (current_tick - prev_tick + length)
+            % length
+            / ((ticks[current_index] - prev_tick + length) % length)
         )
 
         lerp_x = prev_point[0] + (next_point[0] - prev_point[0]) * lerp_ratio
@@ -952,20 +1667,11 @@ class SequencerWidget:
         gfxdraw.aacircle(screen, int(lerp_x), int(lerp_y), 5, self.color)
 
     def draw_border(self, screen: pygame.Surface) -> None:
-        rect = pygame.Rect(
-            self.x + self.margin,
-            self.y + self.margin,
-            self.width - 2 * self.margin,
-            self.height - 2 * self.margin,
-        )
-        gfxdraw.rectangle(screen, rect, (30, 30, 30))
+        gfxdraw.rectangle(screen, self._border_rect, (30, 30, 30))
 
-        hover_surface = pygame.Surface(
-            (self.width - 2 * self.margin, self.height - 2 * self.margin),
-            pygame.SRCALPHA,
-        )
-        hover_surface.fill((220, 220, 220, self.background_alpha))
-        screen.blit(hover_surface, (self.x + self.margin, self.y + self.margin))
+        if self.background_alpha > 0:
+            self._hover_surface.set_alpha(self.background_alpha)
+            screen.blit(self._hover_surface, self._border_rect)
 
         if self.enabled:
             self.background_alpha -= self.alpha_increment
@@ -984,33 +1690,120 @@ class SequencerWidget:
         pass
 
 
-def extract_chords_from_midi(midi_file_path: str) -> Dict[int, List[List[int]]]:
+def extract_chords_from_midi(
+    midi_file_path: str,
+    channels: Optional[Iterable[int]] = None,
+    max_chords: int = 16,
+) -> Dict[int, List[List[int]]]:
+    # 解析結果はファイルの更新時刻とサイズが変わるまで再利用する
+    stat = os.stat(midi_file_path)
+    chords = _load_chords(
+        midi_file_path,
+        tuple(sorted(set(channels))) if channels is not None else None,
+        max_chords,
+        stat.st_mtime_ns,
+        stat.st_size,
+    )
+    # キャッシュしたものを書き換えられないよう、呼び出し側には毎回コピーを渡す
+    return defaultdict(
+        list,
+        {
+            channel: [list(chord) for chord in channel_chords]
+            for channel, channel_chords in chords.items()
+        },
+    )
+
+
+@functools.lru_cache(maxsize=8)
+def _load_chords(
+    midi_file_path: str,
+    channels: Optional[Tuple[int, ...]],
+    max_chords: int,
+    mtime_ns: int,
+    size: int,
+) -> Dict[int, List[List[int]]]:
+    # MIDIファイルの隣にJSONで保存しておき、次回の起動では解析を省く
+    # （pickleだと置かれたファイルを読むだけでコードが実行されうるので使わない）
+    cache_path = midi_file_path + ".chords.json"
+    key = [list(channels) if channels is not None else None, max_chords, mtime_ns, size]
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            cached = json.load(f)
+        if cached["key"] == key:
+            return {
+                int(channel): [[int(note) for note in chord] for chord in chords]
+                for channel, chords in cached["chords"].items()
+            }
+    except (OSError, ValueError, TypeError, KeyError, AttributeError):
+        pass
+
+    chords = dict(_parse_chords_from_midi(midi_file_path, channels, max_chords))
+    # 書きかけのファイルを読まれないよう、一時ファイルに書いてから置き換える
+    try:
+        fd, tmp_path = tempfile.mkstemp(
+            dir=os.path.dirname(cache_path) or ".",
+            prefix=os.path.basename(cache_path) + ".",
+            suffix=".tmp",
+        )
+    except OSError:
+        return chords
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"key": key, "chords": chords}, f)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+    return chords
+
+
+def _parse_chords_from_midi(
+    midi_file_path: str,
+    channels: Optional[Iterable[int]],
+    max_chords: int,
+) -> Dict[int, List[List[int]]]:
     mid = mido.MidiFile(midi_file_path)
+    watched = set(channels) if channels is not None else None
     channel_notes: Dict[int, List[tuple]] = defaultdict(list)
     channel_chords: Dict[int, List[List[int]]] = defaultdict(list)
 
     for track in mid.tracks:
         current_time = 0
+        # トラック内の時刻は単調増加なので、異なる発音時刻がmax_chords個
+        # 集まったチャンネルはそれより後のノートを読む必要がない
+        time_counts: Dict[int, int] = defaultdict(int)
+        last_times: Dict[int, int] = {}
+        finished: Set[int] = set()
         for msg in track:
             current_time += msg.time
-            if not msg.is_meta:
-                if msg.type == "note_on" and msg.velocity > 0:
-                    channel_notes[msg.channel].append((current_time, msg.note))
+            if msg.is_meta or msg.type != "note_on" or msg.velocity == 0:
+                continue
+            channel = msg.channel
+            if watched is not None and channel not in watched:
+                continue
+            if last_times.get(channel) != current_time:
+                if time_counts[channel] >= max_chords:
+                    finished.add(channel)
+                    if watched is not None and finished >= watched:
+                        break
+                    continue
+                time_counts[channel] += 1
+                last_times[channel] = current_time
+            channel_notes[channel].append((current_time, msg.note))
 
     for channel, notes in channel_notes.items():
-        # Group notes by their timing
-        time_to_notes: Dict[int, List[int]] = defaultdict(list)
-        for time, note in notes:
-            time_to_notes[time].append(note)
-
-        # Extract chords
-        for time, extracted_notes in sorted(time_to_notes.items()):
-            if (
-                len(extracted_notes) > 0
-            ):  # More than one note at the same time is a chord
-                channel_chords[channel].append(extracted_notes)
-                if len(channel_chords[channel]) >= 16:
-                    break
+        # 発音時刻で安定ソートし、同じ時刻のノートを1つのコードとしてまとめる
+        events = np.asarray(notes, dtype=np.int64)
+        order = np.argsort(events[:, 0], kind="stable")
+        times = events[order, 0]
+        pitches = events[order, 1]
+        boundaries = np.flatnonzero(np.diff(times)) + 1
+        channel_chords[channel] = [
+            chord.tolist()
+            for chord in np.split(pitches, boundaries[:max_chords])[:max_chords]
+        ]
 
     return channel_chords
 
@@ -1071,7 +1864,7 @@ if __name__ == "__main__":
     sound_nodes: Dict[UUID, SoundNode] = {}
 
     # note listの初期化
-    score = extract_chords_from_midi("./chaosgrid/score.mid")
+    score = extract_chords_from_midi("./chaosgrid/score.mid", channels=(0, 1, 2))
     global_notes_list: List[Dict[str, Any]] = []
     print(score[0])
 
@@ -1227,6 +2020,32 @@ if __name__ == "__main__":
         enable=False,
     )
 
+    # 列ごとのリズムパターン（16分音符単位、インデックスは列番号j）
+    perc_timings = [
+        [False, False, True, False, False, False, False, False] * 2,
+        [False, False, True, False] * 4,
+        [False, False, True, False, False, False, True, True] * 2,
+        [True, False, True, False, True, False, True, True] * 2,
+    ]
+    chord_timings = [
+        [True, False, False, False] * 2 + [False] * 8,
+        [True, False, False, True, False, False, True, False] + [False] * 8,
+        [True, False, False] * 4 + [False] * 4,
+        [True, False, False] * 4 + [True, False] * 2,
+    ]
+    bass_timings = [
+        [False, False, True, False] * 4,
+        [False, False, True, False, False, True, False, True] * 2,
+        [True, False] * 8,
+        [False, True, True, True] * 4,
+    ]
+    # 行ごとのハイハットのシーケンス（インデックスは行番号i）
+    hihat_sequences = [
+        [Note(120 * k + (30 if k % 2 == 1 else 0)) for k in range(16) if k % 4 != i]
+        for i in range(4)
+    ]
+    rng = np.random.default_rng()
+
     for i in range(4):
         for j in range(4):
             cell = grid.cells[i][j]
@@ -1256,76 +2075,38 @@ if __name__ == "__main__":
                 "notes": [
                     {"channel": 0, "note": 42, "gate_time": 10},
                 ],
-                "sequence": [
-                    Note(120 * k + (30 if k % 2 == 1 else 0))
-                    for k in range(16)
-                    if k % 4 != i
-                ],
+                "sequence": hihat_sequences[i],
             }
 
-            timings = []
-            if j == 0:
-                timings = [False, False, True, False, False, False, False, False] * 2
-            if j == 1:
-                timings = [False, False, True, False] * 4
-            if j == 2:
-                timings = [] + [False, False, True, False, False, False, True, True] * 2
-            if j == 3:
-                timings = [] + [True, False, True, False, True, False, True, True] * 2
-
             cell.attributes["perc"] = {
                 "notes": [{"channel": 5, "note": 60 + i * 4 + j, "gate_time": 10}],
-                "sequence": [Note(t * 120) for t, b in enumerate(timings) if b],
+                "sequence": [Note(t * 120) for t, b in enumerate(perc_timings[j]) if b],
             }
 
-            timings = []
-            if j == 0:
-                timings = [True, False, False, False] * 2 + [False] * 8
-            if j == 1:
-                timings = [True, False, False, True, False, False, True, False] + [
-                    False
-                ] * 8
-            if j == 2:
-                timings = [True, False, False] * 4 + [False] * 4
-            if j == 3:
-                timings = [True, False, False] * 4 + [True, False] * 2
-
             cell.attributes["chord"] = {
                 "global_channel": 1,
                 "use_global_notes": True,
                 "global_gate_time": 480,
-                "sequence": [Note(t * 120) for t, b in enumerate(timings) if b],
+                "sequence": [
+                    Note(t * 120) for t, b in enumerate(chord_timings[j]) if b
+                ],
             }
 
-            timings = []
-            if j == 0:
-                timings = [False, False, True, False] * 4
-            if j == 1:
-                timings = [False, False, True, False, False, True, False, True] * 2
-            if j == 2:
-                timings = [True, False] * 8
-            if j == 3:
-                timings = [False, True, True, True] * 4
-
             cell.attributes["bass"] = {
                 "global_channel": 2,
                 "use_global_notes": True,
                 "global_gate_time": 100,
-                "sequence": [Note(t * 120) for t, b in enumerate(timings) if b],
+                "sequence": [Note(t * 120) for t, b in enumerate(bass_timings[j]) if b],
             }
 
-            random_sequence = [True] * 4 * (j + 1) + [False] * 4 * (3 - j)
-            random.shuffle(random_sequence)
+            # 16ステップのうち4 * (j + 1)個をランダムに選ぶ
+            random_steps = np.flatnonzero(rng.permutation(16) < 4 * (j + 1))
 
             cell.attributes["arp"] = {
                 "global_channel": 3,
                 "use_global_notes": True,
                 "global_gate_time": 50 * j,
-                "sequence": [
-                    Note(120 * k)
-                    for idx, k in enumerate(range(16))
-                    if random_sequence[idx]
-                ],
+                "sequence": [Note(120 * int(k)) for k in random_steps],
                 "arpeggio": True,
             }
             cell.attributes["pad"] = {
@@ -1367,11 +2148,30 @@ if __name__ == "__main__":
     ]
 
     bpm = 120
+    fps = 60
     bps = bpm / 60.0
     ticks_per_beat = 480
+    # pygame.time.get_ticks()（ミリ秒）からtickへの換算係数
+    tick_scale = bps * ticks_per_beat / 1000.0
+    # CCの値（0〜127）への換算係数
+    position_cc_scale = 127.0 / field_size
+    speed_cc_scale = 127.0 / 20
+    # 拍内の位置ごとの物理の時間刻み（拍の頭付近で速くなる）
+    dt_table = [
+        1 + min(40 / (min(k + 1, ticks_per_beat - k + 1)), 10)
+        for k in range(ticks_per_beat)
+    ]
 
     print(sound_nodes)
 
+    grid_view = GridView(grid)
+    dirty = DirtyRects((screen_width, screen_height))
+
+    # 背景色とグリッドの枠は変化しないので、毎フレームはこれを1回blitするだけにする
+    background = pygame.Surface((screen_width, screen_height)).convert()
+    background.fill((220, 220, 220))
+    grid_view.draw_background(background, 0, 0)
+
     # UIの初期化
     ui_elements: List[UIElement] = []
 
@@ -1399,65 +2199,84 @@ if __name__ == "__main__":
     for widget in text_widgets:
         ui_elements.append(widget)
 
+    # ループ中に変化しないもの
+    # 数字キーの番号 -> (SoundNode, SequencerWidget)
+    toggle_table = [
+        (sound_nodes[node_id], seq_widget)
+        for node_id, seq_widget in zip(keys.values(), seq_widgets)
+    ]
+    # CCの値（x, y, 速さ）を計算するバッファ。列の並びはPhysicsFieldの行の並びと同じ
+    cc_buffer = np.empty((3, len(physics_field.nodes)), dtype=np.float64)
+
     # メインゲームループ
     while running:
         # イベント処理
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
+            if event.type == pygame.WINDOWEXPOSED:
+                dirty.invalidate()
             if event.type == pygame.KEYDOWN and pygame.K_1 <= event.key <= pygame.K_9:
-                key_number = event.key - pygame.K_0
-                key_list = list(keys.values())
-                sound_nodes[key_list[key_number]].enable = (
-                    False if sound_nodes[key_list[key_number]].enable else True
-                )
-                seq_widgets[key_number].set_enabled(
-                    sound_nodes[key_list[key_number]].enable
-                )
+                sound_node, seq_widget = toggle_table[event.key - pygame.K_0]
+                sound_node.enable = not sound_node.enable
+                seq_widget.set_enabled(sound_node.enable)
             for ui_element in ui_elements:
                 ui_element.update(event)
 
-        current_tick = int(pygame.time.get_ticks() / 1000.0 * bps * ticks_per_beat)
+        current_tick = int(pygame.time.get_ticks() * tick_scale)
 
         # 時間経過の計算
-        dt = 1 + min(
-            40 / (min(current_tick % 480 + 1, 480 - current_tick % 480 + 1)), 10
-        )  # 秒単位での経過時間
+        dt = dt_table[current_tick % ticks_per_beat]  # 秒単位での経過時間
 
         # 物理フィールドの更新
         physics_field.update(dt)
 
-        for i, phy_node in enumerate(physics_field.nodes.values()):
-            instrument.cc(0, 20 + i, phy_node.px / field_size)
-            instrument.cc(0, 30 + i, phy_node.py / field_size)
-            instrument.cc(0, 40 + i, math.sqrt(phy_node.vx**2 + phy_node.vy**2) / 20)
+        # SoAの配列からまとめて計算し、整数に切り捨ててから送る
+        vel = physics_field.vel
+        np.multiply(
+            physics_field.pos.T, position_cc_scale, out=cc_buffer[:2], dtype=np.float64
+        )
+        np.hypot(vel[:, 0], vel[:, 1], out=cc_buffer[2], dtype=np.float64)
+        cc_buffer[2] *= speed_cc_scale
+        x_values, y_values, speed_values = cc_buffer.astype(np.int64).tolist()
+        for i in range(len(x_values)):
+            instrument.cc_int(0, 20 + i, x_values[i])
+            instrument.cc_int(0, 30 + i, y_values[i])
+            instrument.cc_int(0, 40 + i, speed_values[i])
 
-        for _ in range(4):
-            clock.tick(240)
-            # sound_node_listの更新（サウンドノードの更新）
-            current_tick = int(pygame.time.get_ticks() / 1000.0 * bps * ticks_per_beat)
-            sound_node_list.update(current_tick)
+        # フレームレートの調整（1フレームに1回だけ待つ）
+        clock.tick(fps)
 
-            # 楽器の更新
-            instrument.update(current_tick)
+        # sound_node_listの更新（サウンドノードの更新）
+        # 前回の更新からのtickに含まれるノートはSequencer.updateがまとめて鳴らす
+        current_tick = int(pygame.time.get_ticks() * tick_scale)
+        sound_node_list.update(current_tick)
 
-        # 画面のクリア
-        screen.fill((220, 220, 220))
+        # 楽器の更新
+        instrument.update(current_tick)
+
+        # 画面のクリア（背景色とグリッドの枠）
+        screen.blit(background, (0, 0))
 
         # グリッドの描画
-        grid_view = GridView(grid)
-        grid_view.draw(screen, 0, 0)
+        grid_view.draw(screen, 0, 0, dirty)
 
-        # ノードの描画
-        for node_view in node_views:
-            node_view.draw(screen, 0, 0)
+        # ノードの描画（全ノードのスプライトを1回のblitsで描く）
+        screen.blits(
+            [
+                item
+                for node_view in node_views
+                for item in node_view.get_blits(0, 0, dirty)
+            ],
+            doreturn=False,
+        )
 
         # UIの描画
         for ui_element in ui_elements:
-            ui_element.draw(screen)
+            ui_element.draw(screen, dirty)
 
-        # Pygameの画面更新
-        pygame.display.flip()
+        # Pygameの画面更新（変化した領域のみ）
+        dirty.present()
 
     for channel in range(16):
         instrument.channel_note_off(channel)
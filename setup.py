@@ -0,0 +1,8 @@
+# 物理演算のCython拡張（任意）をビルドする:
+#   python setup.py build_ext --inplace
+from Cython.Build import cythonize
+from setuptools import setup
+
+setup(
+    ext_modules=cythonize("chaosgrid/_physics.pyx", language_level=3),
+)
@@ -0,0 +1,133 @@
+import os
+import random
+import shutil
+import tempfile
+import unittest
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+from unittest import mock
+
+import mido
+
+from chaosgrid import chaosgrid
+from chaosgrid.chaosgrid import extract_chords_from_midi
+
+SCORE_PATH = os.path.join(os.path.dirname(chaosgrid.__file__), "score.mid")
+
+
+def reference_chords(
+    midi_file_path: str,
+    channels: Optional[Tuple[int, ...]] = None,
+    max_chords: int = 16,
+) -> Dict[int, List[List[int]]]:
+    # 最適化前のextract_chords_from_midiと同じく全ノートを読んでからまとめる
+    mid = mido.MidiFile(midi_file_path)
+    channel_notes: Dict[int, List[tuple]] = defaultdict(list)
+    for track in mid.tracks:
+        current_time = 0
+        for msg in track:
+            current_time += msg.time
+            if not msg.is_meta and msg.type == "note_on" and msg.velocity > 0:
+                channel_notes[msg.channel].append((current_time, msg.note))
+
+    channel_chords: Dict[int, List[List[int]]] = {}
+    for channel, notes in channel_notes.items():
+        if channels is not None and channel not in channels:
+            continue
+        time_to_notes: Dict[int, List[int]] = defaultdict(list)
+        for time, note in notes:
+            time_to_notes[time].append(note)
+        channel_chords[channel] = [
+            chord for _, chord in sorted(time_to_notes.items())[:max_chords]
+        ]
+    return channel_chords
+
+
+def write_random_midi(path: str, seed: int) -> None:
+    rng = random.Random(seed)
+    mid = mido.MidiFile()
+    for _ in range(3):
+        track = mido.MidiTrack()
+        for _ in range(rng.randint(0, 60)):
+            track.append(
+                mido.Message(
+                    "note_on",
+                    channel=rng.randrange(4),
+                    note=rng.randrange(40, 80),
+                    velocity=rng.choice((0, 64, 100)),
+                    time=rng.choice((0, 0, 0, 10, 240)),
+                )
+            )
+        mid.tracks.append(track)
+    mid.save(path)
+
+
+class ExtractChordsTest(unittest.TestCase):
+    def setUp(self) -> None:
+        # MIDIファイルの隣にキャッシュが作られるので一時ディレクトリで試す
+        self.tmpdir = tempfile.mkdtemp()
+        self.score_path = os.path.join(self.tmpdir, "score.mid")
+        shutil.copy(SCORE_PATH, self.score_path)
+        chaosgrid._load_chords.cache_clear()
+
+    def tearDown(self) -> None:
+        chaosgrid._load_chords.cache_clear()
+        shutil.rmtree(self.tmpdir)
+
+    def test_score_matches_reference(self) -> None:
+        for channels in (None, (0, 1, 2), (1,), (2, 0)):
+            with self.subTest(channels=channels):
+                self.assertEqual(
+                    dict(extract_chords_from_midi(self.score_path, channels)),
+                    reference_chords(self.score_path, channels),
+                )
+
+    def test_random_files_match_reference(self) -> None:
+        for seed in range(20):
+            path = os.path.join(self.tmpdir, f"random{seed}.mid")
+            write_random_midi(path, seed)
+            for channels in (None, (0, 2)):
+                for max_chords in (1, 3, 16):
+                    with self.subTest(seed=seed, channels=channels, max=max_chords):
+                        self.assertEqual(
+                            dict(extract_chords_from_midi(path, channels, max_chords)),
+                            reference_chords(path, channels, max_chords),
+                        )
+
+    def test_reads_cache_file_on_next_load(self) -> None:
+        expected = reference_chords(self.score_path, (0, 1, 2))
+        extract_chords_from_midi(self.score_path, (0, 1, 2))
+        self.assertTrue(os.path.exists(self.score_path + ".chords.json"))
+        self.assertEqual(
+            sorted(os.listdir(self.tmpdir)), ["score.mid", "score.mid.chords.json"]
+        )
+
+        chaosgrid._load_chords.cache_clear()
+        with mock.patch.object(chaosgrid, "_parse_chords_from_midi") as parse:
+            chords = extract_chords_from_midi(self.score_path, (0, 1, 2))
+        parse.assert_not_called()
+        self.assertEqual(dict(chords), expected)
+
+    def test_ignores_broken_cache_file(self) -> None:
+        with open(self.score_path + ".chords.json", "w") as f:
+            f.write('{"key": ')
+
+        self.assertEqual(
+            dict(extract_chords_from_midi(self.score_path, (0, 1, 2))),
+            reference_chords(self.score_path, (0, 1, 2)),
+        )
+
+    def test_returned_chords_are_not_shared(self) -> None:
+        expected = reference_chords(self.score_path, (0, 1, 2))
+        chords = extract_chords_from_midi(self.score_path, (0, 1, 2))
+        self.assertEqual(chords[5], [])
+        chords[0].append([1, 2, 3])
+        chords[1][0].append(99)
+
+        chords = extract_chords_from_midi(self.score_path, (0, 1, 2))
+        self.assertNotIn(5, chords)
+        self.assertEqual(dict(chords), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
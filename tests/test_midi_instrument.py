@@ -0,0 +1,148 @@
+import random
+import unittest
+from typing import Any, Dict, List, Tuple
+
+import mido
+
+from chaosgrid.chaosgrid import MidiInstrument
+
+
+class FakePort:
+    def __init__(self) -> None:
+        self.messages: List[mido.Message] = []
+
+    def send(self, message: mido.Message) -> None:
+        self.messages.append(message)
+
+    def pop_note_offs(self) -> List[Tuple[int, int]]:
+        note_offs = [
+            (message.channel, message.note)
+            for message in self.messages
+            if message.type == "note_off"
+        ]
+        self.messages.clear()
+        return note_offs
+
+
+class ReferenceInstrument:
+    # 最適化前のMidiInstrumentと同じく、経過tickを数えてノートオフする
+    def __init__(self) -> None:
+        self.playing: Dict[Tuple[int, int], Dict[str, Any]] = {}
+        self.last_tick = 0
+        self.note_offs: List[Tuple[int, int]] = []
+
+    def note_on(self, channel: int, note: int, gate_time: int) -> None:
+        if gate_time > 0:
+            self.playing[(channel, note)] = {"tick_elapsed": 0, "gate_time": gate_time}
+
+    def channel_note_off(self, channel: int) -> None:
+        for key in list(self.playing):
+            if key[0] == channel:
+                self.note_offs.append(key)
+                del self.playing[key]
+
+    def update(self, tick: int) -> None:
+        delta_tick = max(tick - self.last_tick, 0)
+        self.last_tick = tick
+        for key, info in list(self.playing.items()):
+            info["tick_elapsed"] += delta_tick
+            if info["tick_elapsed"] >= info["gate_time"]:
+                self.note_offs.append(key)
+                del self.playing[key]
+
+
+class MidiInstrumentTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.port = FakePort()
+        self.instrument = MidiInstrument(self.port)
+
+    def note_offs_at(self, tick: int) -> List[Tuple[int, int]]:
+        self.instrument.update(tick)
+        return self.port.pop_note_offs()
+
+    def test_note_off_after_gate_time(self) -> None:
+        self.instrument.update(10)
+        self.instrument.note_on(0, 60, 4, 1.0)
+        self.instrument.note_on(0, 64, 0, 1.0)
+
+        self.assertEqual(self.note_offs_at(13), [])
+        self.assertEqual(self.note_offs_at(14), [(0, 60)])
+        self.assertEqual(self.note_offs_at(100), [])
+        self.assertEqual(self.instrument.playing, {})
+
+    def test_retrigger_extends_gate(self) -> None:
+        self.instrument.note_on(0, 60, 4, 1.0)
+        self.instrument.update(2)
+        self.instrument.note_on(0, 60, 4, 1.0)
+
+        self.assertEqual(self.note_offs_at(4), [])
+        self.assertEqual(self.note_offs_at(5), [])
+        self.assertEqual(self.note_offs_at(6), [(0, 60)])
+        self.assertEqual(self.note_offs_at(10), [])
+
+    def test_channel_note_off_only_stops_that_channel(self) -> None:
+        self.instrument.note_on(0, 60, 4, 1.0)
+        self.instrument.note_on(0, 64, 8, 1.0)
+        self.instrument.note_on(1, 60, 4, 1.0)
+        self.port.messages.clear()
+
+        self.instrument.channel_note_off(0)
+        self.assertCountEqual(self.port.pop_note_offs(), [(0, 60), (0, 64)])
+        self.assertEqual(self.note_offs_at(4), [(1, 60)])
+        self.assertEqual(self.note_offs_at(8), [])
+
+    def test_note_on_after_channel_note_off(self) -> None:
+        self.instrument.note_on(0, 60, 4, 1.0)
+        self.instrument.update(1)
+        self.instrument.channel_note_off(0)
+        self.instrument.update(2)
+        self.instrument.note_on(0, 60, 4, 1.0)
+        self.port.messages.clear()
+
+        # 消したノートの古い期限では止めない
+        self.assertEqual(self.note_offs_at(4), [])
+        self.assertEqual(self.note_offs_at(6), [(0, 60)])
+
+    def test_matches_reference_for_random_events(self) -> None:
+        rng = random.Random(0)
+        reference = ReferenceInstrument()
+        tick = 0
+        for _ in range(500):
+            action = rng.random()
+            channel = rng.randrange(3)
+            if action < 0.5:
+                note = rng.randrange(60, 64)
+                gate_time = rng.randint(0, 8)
+                self.instrument.note_on(channel, note, gate_time, 1.0)
+                reference.note_on(channel, note, gate_time)
+            elif action < 0.6:
+                self.instrument.channel_note_off(channel)
+                reference.channel_note_off(channel)
+            else:
+                tick += rng.randint(0, 3)
+                self.instrument.update(tick)
+                reference.update(tick)
+
+            # 同じタイミングのノートオフは順序ではなく集合として比べる
+            self.assertCountEqual(self.port.pop_note_offs(), reference.note_offs)
+            reference.note_offs.clear()
+            self.assertEqual(set(self.instrument.playing), set(reference.playing))
+
+    def test_cc_clamps_value(self) -> None:
+        for value, expected in (
+            (0.5, 63),
+            (-0.5, 0),
+            (1.5, 127),
+            (float("inf"), 127),
+            (float("-inf"), 0),
+        ):
+            self.instrument.cc(2, 20, value)
+            message = self.port.messages.pop()
+            self.assertEqual(
+                (message.type, message.channel, message.control, message.value),
+                ("control_change", 2, 20, expected),
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
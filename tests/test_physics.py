@@ -0,0 +1,200 @@
+import math
+import random
+import unittest
+from typing import Any, ContextManager, List, Optional, Tuple
+from unittest import mock
+from uuid import uuid4
+
+import numpy as np
+
+from chaosgrid import chaosgrid
+from chaosgrid.chaosgrid import PhysicsField, PhysicsNode
+
+FIELD = (20, 10, 400, 300)
+
+
+def reference_force(
+    states: List[List[float]], i: int, cutoff: Optional[float] = None
+) -> Tuple[float, float]:
+    # 最適化前のPhysicsField.get_forceと同じ計算をfloat64のループで行う
+    px, py = states[i][:2]
+    fx = 0.0
+    fy = 0.0
+    for j, (ox, oy, _, _, _) in enumerate(states):
+        if i == j:
+            continue
+        dx = ox - px
+        dy = oy - py
+        dist_sq = dx**2 + dy**2
+        if dist_sq <= PhysicsField.MIN_DIST_SQ:
+            continue
+        if cutoff is not None and dist_sq > cutoff**2:
+            continue
+        dist = math.sqrt(dist_sq)
+        force = min(
+            PhysicsField.ATTRACTIVE_FORCE_CONST / dist_sq,
+            PhysicsField.MAX_ATTRACTIVE_FORCE,
+        )
+        fx += force * dx / dist
+        fy += force * dy / dist
+    return fx, fy
+
+
+def reference_step(
+    states: List[List[float]], dt: float, cutoff: Optional[float] = None
+) -> List[List[float]]:
+    # 最適化前のPhysicsField.updateと同じ手順で1ステップ進める
+    x0, y0, width, height = FIELD
+    forces = [reference_force(states, i, cutoff) for i in range(len(states))]
+
+    result = []
+    for (px, py, vx, vy, mass), (fx, fy) in zip(states, forces):
+        vmax = PhysicsField.MAX_VELOCITY
+        vx = min(max((vx + fx / mass) * PhysicsField.DAMPING, -vmax), vmax)
+        vy = min(max((vy + fy / mass) * PhysicsField.DAMPING, -vmax), vmax)
+        if px < x0 or px > x0 + width:
+            px = min(max(px, x0), x0 + width)
+            vx = -vx
+        if py < y0 or py > y0 + height:
+            py = min(max(py, y0), y0 + height)
+            vy = -vy
+        result.append([px + vx * dt, py + vy * dt, vx, vy, mass])
+    return result
+
+
+def make_states(count: int, seed: int) -> List[List[float]]:
+    rng = random.Random(seed)
+    x0, y0, width, height = FIELD
+    states = []
+    for _ in range(count):
+        states.append(
+            [
+                float(rng.randint(x0 - 5, x0 + width + 5)),
+                float(rng.randint(y0 - 5, y0 + height + 5)),
+                float(rng.randint(-20, 20)),
+                float(rng.randint(-20, 20)),
+                float(rng.choice((0.5, 1.0, 2.0, 4.0))),
+            ]
+        )
+    return states
+
+
+def make_field(states: List[List[float]]) -> Tuple[PhysicsField, List[PhysicsNode]]:
+    nodes = [PhysicsNode(0, 0, 5, mass, "test", uuid4()) for *_, mass in states]
+    field = PhysicsField(*FIELD, {node.get_id(): node for node in nodes})
+    for node, (px, py, vx, vy, _) in zip(nodes, states):
+        node.px = px
+        node.py = py
+        node.vx = vx
+        node.vy = vy
+    return field, nodes
+
+
+def numpy_backend() -> ContextManager[Any]:
+    # NumbaやCythonのカーネルがあってもNumPy実装で計算させる
+    return mock.patch.multiple(chaosgrid, physics_step=None, compute_forces=None)
+
+
+class PhysicsFieldTest(unittest.TestCase):
+    def assert_step_matches(self, cutoff: Optional[float] = None) -> None:
+        states = make_states(40, seed=1)
+        field, nodes = make_field(states)
+        field.update(0.5)
+
+        expected = np.array(reference_step(states, 0.5, cutoff))[:, :4]
+        actual = np.array([[n.px, n.py, n.vx, n.vy] for n in nodes])
+        np.testing.assert_allclose(actual, expected, rtol=1e-4, atol=1e-3)
+
+    def test_numpy_step_matches_reference(self) -> None:
+        with numpy_backend():
+            self.assert_step_matches()
+
+    def test_cutoff_step_matches_reference(self) -> None:
+        with numpy_backend(), mock.patch.object(PhysicsField, "CUTOFF_DIST", 120.0):
+            self.assert_step_matches(cutoff=120.0)
+
+    def test_barnes_hut_step_matches_reference(self) -> None:
+        # θ=0 ならどのセルも近似されず直接和と一致する
+        with numpy_backend(), mock.patch.multiple(
+            PhysicsField, BARNES_HUT_MIN_NODES=0, BARNES_HUT_THETA=0.0
+        ):
+            self.assert_step_matches()
+
+    def test_barnes_hut_far_cluster_matches_reference(self) -> None:
+        # 遠くの小さな塊は重心1点で近似され、その誤差はほぼ無い
+        x0, y0, width, height = FIELD
+        states = [
+            [x0 + (i % 5) * 0.25, y0 + (i // 5) * 0.25, 0.0, 0.0, 1.0]
+            for i in range(20)
+        ]
+        states.append([x0 + width, y0 + height, 0.0, 0.0, 1.0])
+        field, nodes = make_field(states)
+        with numpy_backend(), mock.patch.object(
+            PhysicsField, "BARNES_HUT_MIN_NODES", 0
+        ):
+            forces = field.get_forces()
+
+        np.testing.assert_allclose(
+            forces[field.index[nodes[-1].get_id()]],
+            reference_force(states, len(states) - 1),
+            rtol=1e-4,
+        )
+
+    def test_barnes_hut_error_is_bounded(self) -> None:
+        # 自身を含むセルが近似されないのはθ < 1/√2 の場合だけ
+        self.assertLess(PhysicsField.BARNES_HUT_THETA, 1 / math.sqrt(2))
+
+        states = make_states(PhysicsField.BARNES_HUT_MIN_NODES, seed=4)
+        field, _ = make_field(states)
+        with numpy_backend():
+            approx = field.get_forces()
+            with mock.patch.object(PhysicsField, "BARNES_HUT_MIN_NODES", 10**9):
+                exact = field.get_forces()
+
+        norms = np.linalg.norm(exact, axis=1)
+        error = np.linalg.norm(approx - exact, axis=1)[norms > 0] / norms[norms > 0]
+        self.assertGreater(np.median(error), 1e-4)  # 実際に近似されている
+        self.assertLess(np.median(error), 0.03)
+        self.assertLess(np.percentile(error, 99), 0.25)
+
+    @unittest.skipIf(chaosgrid.compute_forces is None, "Cython extension not built")
+    def test_cython_step_matches_reference(self) -> None:
+        with mock.patch.object(chaosgrid, "physics_step", None):
+            self.assert_step_matches()
+            with mock.patch.object(PhysicsField, "CUTOFF_DIST", 120.0):
+                self.assert_step_matches(cutoff=120.0)
+
+    @unittest.skipIf(chaosgrid.physics_step is None, "numba is not installed")
+    def test_numba_step_matches_reference(self) -> None:
+        self.assert_step_matches()
+        with mock.patch.object(PhysicsField, "CUTOFF_DIST", 120.0):
+            self.assert_step_matches(cutoff=120.0)
+
+    def test_get_force_matches_reference(self) -> None:
+        states = make_states(40, seed=2)
+        field, nodes = make_field(states)
+        for cutoff in (None, 120.0):
+            with self.subTest(cutoff=cutoff), mock.patch.object(
+                PhysicsField, "CUTOFF_DIST", cutoff
+            ):
+                for i, node in enumerate(nodes):
+                    np.testing.assert_allclose(
+                        field.get_force(node),
+                        reference_force(states, i, cutoff),
+                        rtol=1e-4,
+                        atol=1e-3,
+                    )
+
+    def test_remove_node_keeps_rows_in_sync(self) -> None:
+        states = make_states(5, seed=3)
+        field, nodes = make_field(states)
+        field.remove_node(nodes[1])
+
+        self.assertEqual(len(field.pos), 4)
+        for node, (px, py, *_) in zip(nodes[:1] + nodes[2:], states[:1] + states[2:]):
+            self.assertEqual((node.px, node.py), (px, py))
+            self.assertEqual(field.index[node.get_id()], node.idx)
+
+
+if __name__ == "__main__":
+    unittest.main()
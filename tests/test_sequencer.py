@@ -0,0 +1,103 @@
+import random
+import unittest
+from typing import List
+
+from chaosgrid.chaosgrid import Note, NoteInterface, Sequencer
+
+
+def reference_fired(
+    notes: List[NoteInterface], length: int, last_tick: int, tick: int
+) -> List[NoteInterface]:
+    # 最適化前のSequencer.updateと同じ判定で、発音するノートを集める
+    if tick < last_tick:
+        last_tick = tick
+    current_tick = tick % length
+    last_tick_mod = last_tick % length
+
+    fired = []
+    for note in notes:
+        note_tick = note.get_tick()
+        if last_tick_mod <= current_tick:
+            if last_tick_mod < note_tick <= current_tick:
+                fired.append(note)
+        else:
+            if last_tick_mod < note_tick or note_tick <= current_tick:
+                fired.append(note)
+    return fired
+
+
+class SequencerTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.fired: List[NoteInterface] = []
+        self.sequencer = Sequencer(16, self.fired.append)
+
+    def fired_ticks(self, tick: int) -> List[int]:
+        self.fired.clear()
+        self.sequencer.update(tick)
+        return [note.get_tick() for note in self.fired]
+
+    def test_fires_notes_in_window(self) -> None:
+        self.sequencer.notes = [Note(8), Note(3), Note(0), Note(3)]
+
+        self.assertEqual(self.fired_ticks(3), [3, 3])
+        self.assertEqual(self.fired_ticks(3), [])
+        self.assertEqual(self.fired_ticks(7), [])
+        self.assertEqual(self.fired_ticks(8), [8])
+
+    def test_fires_notes_across_wrap_around(self) -> None:
+        self.sequencer.notes = [Note(1), Note(15), Note(0), Note(9)]
+
+        self.assertEqual(self.fired_ticks(14), [1, 9])
+        self.assertEqual(self.fired_ticks(18), [15, 0, 1])
+        self.assertEqual(self.fired_ticks(31), [9, 15])
+
+    def test_tick_going_backwards_restarts_window(self) -> None:
+        self.sequencer.notes = [Note(2), Note(5)]
+
+        self.assertEqual(self.fired_ticks(10), [2, 5])
+        self.assertEqual(self.fired_ticks(4), [])
+        self.assertEqual(self.fired_ticks(5), [5])
+
+    def test_empty_sequence_advances_tick(self) -> None:
+        self.assertEqual(self.fired_ticks(5), [])
+        self.sequencer.notes = [Note(4), Note(6)]
+        self.assertEqual(self.fired_ticks(6), [6])
+
+    def test_reassigning_modified_list_resorts(self) -> None:
+        self.sequencer.notes = [Note(4)]
+        self.sequencer.notes.append(Note(2))
+        self.sequencer.notes = self.sequencer.notes
+
+        self.assertEqual(self.fired_ticks(5), [2, 4])
+
+        # 長さが変わらない置き換えでも並べ替え直す
+        self.sequencer.notes[0] = Note(12)
+        self.sequencer.notes = self.sequencer.notes
+
+        self.assertEqual(self.fired_ticks(13), [12])
+
+    def test_matches_reference_for_random_ticks(self) -> None:
+        rng = random.Random(0)
+        for _ in range(50):
+            length = rng.randint(1, 32)
+            notes: List[NoteInterface] = [
+                Note(rng.randrange(length)) for _ in range(rng.randint(0, 12))
+            ]
+            fired: List[NoteInterface] = []
+            sequencer = Sequencer(length, fired.append)
+            sequencer.notes = notes
+
+            tick = 0
+            for _ in range(40):
+                last_tick = sequencer.last_tick
+                tick = max(tick + rng.randint(-2, length + 2), 0)
+                fired.clear()
+                sequencer.update(tick)
+
+                # 同じ窓のノートは発音順ではなく集合として比べる
+                expected = reference_fired(notes, length, last_tick, tick)
+                self.assertCountEqual(fired, expected)
+
+
+if __name__ == "__main__":
+    unittest.main()